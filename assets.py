@@ -0,0 +1,55 @@
+import base64
+import hashlib
+import mimetypes
+import os
+import re
+import streamlit as st
+
+# ---------------------------------------------------------------------
+# Static assets
+#
+# Images and stylesheets are read, encoded and fingerprinted once per
+# process rather than on every rerun. Images are published into ./static
+# under a content-hashed name and referenced by URL (Streamlit's static
+# file serving, enabled in .streamlit/config.toml), so browsers download
+# them once and each rerun only ships a short <img src>. When static
+# serving is off or ./static is not writable, a cached data URI is used.
+# ---------------------------------------------------------------------
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+STATIC_DIR = os.path.join(APP_DIR, "static")
+STATIC_URL = "app/static"
+
+def _read(path):
+    with open(os.path.join(APP_DIR, path), "rb") as f:
+        return f.read()
+
+def fingerprint(data):
+    return hashlib.sha256(data).hexdigest()[:12]
+
+@st.cache_resource(show_spinner=False)
+def image_url(path):
+    """URL for an image, served from ./static under a fingerprinted name."""
+    data = _read(path)
+    mime = mimetypes.guess_type(path)[0] or "application/octet-stream"
+    if st.get_option("server.enableStaticServing"):
+        name, ext = os.path.splitext(os.path.basename(path))
+        published = f"{name}.{fingerprint(data)}{ext}"
+        try:
+            os.makedirs(STATIC_DIR, exist_ok=True)
+            target = os.path.join(STATIC_DIR, published)
+            if not os.path.exists(target):
+                with open(target, "wb") as f:
+                    f.write(data)
+            return f"{STATIC_URL}/{published}"
+        except OSError:
+            pass
+    return f"data:{mime};base64,{base64.b64encode(data).decode()}"
+
+@st.cache_resource(show_spinner=False)
+def stylesheet(path):
+    """Minified <style> block for a CSS file. Identical on every rerun."""
+    css = _read(path).decode()
+    css = re.sub(r"/\*.*?\*/", "", css, flags=re.S)
+    css = re.sub(r"\s+", " ", css)
+    css = re.sub(r"\s*([{}:;,>])\s*", r"\1", css).strip()
+    return f"<style>{css}</style>"
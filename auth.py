@@ -0,0 +1,340 @@
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import os
+import secrets
+import threading
+import time
+from dataclasses import dataclass
+import streamlit as st
+import streamlit.components.v1 as components
+from storage import get_store
+
+# ---------------------------------------------------------------------
+# Authentication
+#
+# Users live in the store with salted PBKDF2 password hashes and the teams
+# they may see; admins see every team. Hashing is deliberately slow, so it
+# only happens when someone presses Authenticate. A successful login issues
+# a session token (a random id and expiry signed with the server secret),
+# kept in a browser cookie and stored server-side. Reconnects and new tabs
+# resume from the cookie: the signature is checked, then the session is a
+# dict lookup in the in-process SessionCache, falling back to one indexed
+# read after a restart. Cached sessions are evicted after IDLE_SECS unused
+# and never outlive SESSION_TTL. Signing out deletes the session
+# everywhere.
+#
+# The secret comes from TEAMTRACKER_SECRET, or is generated once and kept
+# in the store. A store without a usable admin gets one: TEAMTRACKER_ADMIN
+# (default "admin") with the password from TEAMTRACKER_ADMIN_PASSWORD, or
+# a random one that is logged once. Accounts still on the passwords early
+# versions shipped with are locked until an admin resets them.
+# ---------------------------------------------------------------------
+ITERATIONS = 200_000
+SESSION_TTL = 14 * 24 * 3600
+IDLE_SECS = 3600
+CACHE_SIZE = 10_000
+COOKIE = "tt_session"
+MIN_PASSWORD = 8
+SEED_TEAM = "Gemba"
+LOCKED = "!"          # stored in place of a hash: no password matches
+
+# Hashes of publicly known passwords seeded by earlier versions
+RETIRED_HASHES = {
+    "pbkdf2_sha256$200000$27f4c8957cfa58e8a5a9632dbcde6a8a$"
+    "7cc27f33b8da06af9cdbe944f7374c312f3ae1f8ca6e82071d8e07a4a6cb76b9",
+    "pbkdf2_sha256$200000$c930ff8f5456278c98b7fcab26286750$"
+    "bd7b530b0b62f01af77960c489e6a264a816653c89bafb3aff5fcf00a3dcb248",
+}
+
+log = logging.getLogger("teamtracker.auth")
+
+
+# --- passwords -------------------------------------------------------
+def hash_password(password, salt=None, iterations=ITERATIONS):
+    """Encoded salted hash: pbkdf2_sha256$iterations$salt$hash (hex)."""
+    salt = salt or secrets.token_bytes(16)
+    digest = hashlib.pbkdf2_hmac("sha256", password.encode(), salt, iterations)
+    return f"pbkdf2_sha256${iterations}${salt.hex()}${digest.hex()}"
+
+
+def check_password(password, encoded):
+    try:
+        scheme, iterations, salt, digest = encoded.split("$")
+    except (AttributeError, ValueError):
+        return False
+    if scheme != "pbkdf2_sha256":
+        return False
+    expected = hash_password(password, bytes.fromhex(salt), int(iterations)).rsplit("$", 1)[1]
+    return hmac.compare_digest(expected, digest)
+
+
+# Checked against when the user does not exist, so both cases cost the same
+_DUMMY_HASH = hash_password("", b"\0" * 16)
+
+
+# --- sessions --------------------------------------------------------
+@dataclass(frozen=True, slots=True)
+class Session:
+    username: str
+    teams: tuple
+    is_admin: bool
+    expires: float
+
+
+class SessionCache:
+    """Signed-in sessions by token, with idle and absolute expiry."""
+    def __init__(self, idle=IDLE_SECS, size=CACHE_SIZE):
+        self.idle = idle
+        self.size = size
+        self._lock = threading.Lock()
+        self._entries = {}    # token -> [Session, evict at]
+
+    def get(self, token, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                return None
+            session, evict_at = entry
+            if now >= min(evict_at, session.expires):
+                del self._entries[token]
+                return None
+            entry[1] = now + self.idle
+            return session
+
+    def put(self, token, session, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            if len(self._entries) >= self.size:
+                self._prune(now)
+            self._entries[token] = [session, now + self.idle]
+
+    def drop(self, token=None, username=None):
+        with self._lock:
+            if token is not None:
+                self._entries.pop(token, None)
+            else:
+                for t in [t for t, (s, _) in self._entries.items() if s.username == username]:
+                    del self._entries[t]
+
+    def _prune(self, now):
+        for t in [t for t, (s, e) in self._entries.items() if now >= min(e, s.expires)]:
+            del self._entries[t]
+        # Still full: evict the entries closest to going idle
+        excess = len(self._entries) - self.size + 1
+        if excess > 0:
+            for t, _ in sorted(self._entries.items(), key=lambda kv: kv[1][1])[:excess]:
+                del self._entries[t]
+
+    def __len__(self):
+        return len(self._entries)
+
+
+@st.cache_resource(show_spinner=False)
+def session_cache():
+    return SessionCache()
+
+
+@st.cache_resource(show_spinner=False)
+def _secret():
+    """Token signing key; also seeds the first users of an empty store."""
+    store = get_store()
+    lock_retired(store)
+    if not any(is_admin and store.user(u)[0] != LOCKED for u, is_admin in store.users()):
+        seed_admin(store)
+    secret = os.environ.get("TEAMTRACKER_SECRET")
+    if not secret:
+        secret = store.set_setting("session_secret", secrets.token_hex(32))
+    return secret.encode()
+
+
+def lock_retired(store):
+    """Lock accounts whose password is one of RETIRED_HASHES."""
+    for username, is_admin in store.users():
+        if store.user(username)[0] in RETIRED_HASHES:
+            store.save_user(username, LOCKED, is_admin)
+            store.delete_sessions(username=username)
+            log.warning("Locked user %r: it used a publicly known password.", username)
+
+
+def seed_admin(store):
+    """Create (or reset) the admin account; returns the username."""
+    username = os.environ.get("TEAMTRACKER_ADMIN") or "admin"
+    password = os.environ.get("TEAMTRACKER_ADMIN_PASSWORD")
+    if password and len(password) < MIN_PASSWORD:
+        raise ValueError(f"TEAMTRACKER_ADMIN_PASSWORD needs at least {MIN_PASSWORD} characters")
+    if not password:
+        password = secrets.token_urlsafe(12)
+        log.warning("Created admin user %r with password %s; change it on the Admin page.",
+                    username, password)
+    store.save_user(username, hash_password(password), True, [store.ensure_team(SEED_TEAM)])
+    return username
+
+
+def _b64(data):
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def _unb64(text):
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+def _sign(payload):
+    body = _b64(json.dumps(payload, separators=(",", ":")).encode())
+    sig = _b64(hmac.new(_secret(), body.encode(), hashlib.sha256).digest())
+    return f"{body}.{sig}"
+
+
+def _verify(token):
+    """The payload of a well-formed, correctly signed, unexpired token, or None."""
+    try:
+        body, sig = token.split(".")
+        expected = _b64(hmac.new(_secret(), body.encode(), hashlib.sha256).digest())
+        if not hmac.compare_digest(sig, expected):
+            return None
+        payload = json.loads(_unb64(body))
+    except (AttributeError, ValueError):
+        return None
+    return payload if payload.get("exp", 0) > time.time() else None
+
+
+def _key(payload):
+    """Store key of a session: its id, so a leaked table holds no usable tokens."""
+    return hashlib.sha256(payload["sid"].encode()).hexdigest()
+
+
+def _load(username, expires):
+    store = get_store()
+    found = store.user(username)
+    if found is None:
+        return None
+    teams = tuple(t for t, _ in store.teams()) if found[1] else tuple(store.user_teams(username))
+    return Session(username, teams, found[1], expires)
+
+
+def authenticate(username, password):
+    """A new session token for valid credentials, else None."""
+    _secret()
+    found = get_store().user(username) if username else None
+    if not check_password(password, found[0] if found else _DUMMY_HASH) or found is None:
+        return None
+    payload = {"sid": secrets.token_hex(16), "exp": int(time.time() + SESSION_TTL)}
+    token = _sign(payload)
+    session = _load(username, payload["exp"])
+    get_store().save_session(_key(payload), username, payload["exp"])
+    session_cache().put(token, session)
+    return token
+
+
+def resume(token):
+    """The live Session for a token, or None if it is invalid, expired or signed out."""
+    if not token:
+        return None
+    cache = session_cache()
+    session = cache.get(token)
+    if session is not None:
+        return session
+    payload = _verify(token)
+    if payload is None:
+        return None
+    found = get_store().load_session(_key(payload))
+    if found is None:
+        return None
+    session = _load(*found)
+    if session is not None:
+        cache.put(token, session)
+    return session
+
+
+def end_session(token):
+    payload = _verify(token)
+    if payload is not None:
+        get_store().delete_sessions(key=_key(payload))
+    session_cache().drop(token)
+
+
+def sign_out_everywhere(username):
+    """End every session of a user, e.g. after a password change."""
+    get_store().delete_sessions(username=username)
+    session_cache().drop(username=username)
+
+
+def save_user(username, password, team_ids, is_admin=False):
+    """Create a user or reset their password, teams and role."""
+    get_store().save_user(username, hash_password(password), is_admin, team_ids)
+    sign_out_everywhere(username)
+
+
+# --- this browser session --------------------------------------------
+def sign_in(token, session, remember=False):
+    """Mark this browser session signed in; `remember` also sets the cookie."""
+    st.session_state.authenticated = True
+    st.session_state.session_token = token
+    st.session_state.username = session.username
+    st.session_state.teams = session.teams
+    st.session_state.is_admin = session.is_admin
+    if st.session_state.get("team_id") not in session.teams and session.teams:
+        st.session_state.team_id = session.teams[0]
+    if remember:
+        st.session_state.cookie = token
+
+
+def restore_session():
+    """True if this browser session is signed in, resuming it from the cookie if needed.
+
+    Runs every rerun: for a signed-in session it is one cache lookup.
+    """
+    token = st.session_state.get("session_token")
+    if token is not None:
+        if resume(token) is not None:
+            return True
+        sign_out()
+        return False
+    if st.session_state.get("authenticated"):
+        return True
+    token = st.context.cookies.get(COOKIE)
+    session = resume(token)
+    if session is None:
+        return False
+    sign_in(token, session)
+    return True
+
+
+def sign_out():
+    token = st.session_state.get("session_token")
+    if token is not None:
+        end_session(token)
+    st.session_state.clear()
+    st.session_state.authenticated = False
+    st.session_state.cookie = ""
+
+
+def write_cookie():
+    """Store (or clear) the session cookie in the browser, once per change."""
+    value = st.session_state.pop("cookie", None)
+    if value is None:
+        return
+    age = SESSION_TTL if value else 0
+    html = (f"<script>document.cookie = '{COOKIE}={value}; path=/; "
+            f"max-age={age}; SameSite=Strict';</script>")
+    if hasattr(st, "iframe"):
+        st.iframe(html, height=1)
+    else:
+        components.html(html, height=0)
+
+
+def visible_teams():
+    """Team ids the signed-in user may see, or None for all (admins, no sign-in)."""
+    if st.session_state.get("is_admin"):
+        return None
+    teams = st.session_state.get("teams")
+    return None if teams is None else list(teams)
+
+
+def allowed_team(team_id):
+    """Whether the signed-in user may see `team_id` (always, without sign-in)."""
+    teams = st.session_state.get("teams")
+    return teams is None or team_id in teams
@@ -0,0 +1,196 @@
+"""Benchmarks for the match page, driven through Streamlit's AppTest harness.
+
+    python benchmarks/bench_match.py                    # roster sweep 4..25
+    python benchmarks/bench_match.py --players 25 40    # custom roster sizes
+    python benchmarks/bench_match.py --memory           # plus allocation peaks
+    python benchmarks/bench_match.py --load 10          # 10 concurrent coaches
+    python benchmarks/bench_match.py --load 10 --autorefresh
+
+Each scripted match starts a quarter, makes a run of position changes, ends
+the quarter (four times) and exports the PDF. For every rerun we record
+wall-clock latency, the size of the rendered element protos (what the
+websocket pushes to the browser) and, with --memory, the peak Python
+allocation during the rerun.
+See benchmarks/README.md for recorded numbers.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, APP_DIR)
+os.environ.setdefault("TEAMTRACKER_STORE",
+                      f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}")
+
+from streamlit.testing.v1 import AppTest  # noqa: E402
+from storage import get_store  # noqa: E402
+
+CHOICES = ["Off", "FWD", "MID", "DEF"]
+
+
+def payload_bytes(node):
+    """Serialized size of every element proto under an AppTest tree node."""
+    total = 0
+    proto = getattr(node, "proto", None)
+    if proto is not None:
+        total += proto.ByteSize()
+    for child in getattr(node, "children", {}).values():
+        total += payload_bytes(child)
+    return total
+
+
+def new_session(players, autorefresh=False):
+    """AppTest session logged in to a fresh team with `players` on its roster."""
+    store = get_store()
+    team_id = store.ensure_team(f"bench-{time.time_ns()}-{random.random()}")
+    store.update_squad(team_id, [{"name": n} for n in players])
+    at = AppTest.from_file(os.path.join(APP_DIR, "index.py"), default_timeout=60)
+    at.session_state["authenticated"] = True
+    at.session_state["team_id"] = team_id
+    at.session_state["page"] = "Match"
+    at.session_state["client_clock"] = not autorefresh
+    return at
+
+
+class Recorder:
+    def __init__(self, trace_memory=True, run_lock=None):
+        self.samples = {}
+        self.trace_memory = trace_memory
+        self.run_lock = run_lock
+
+    def run(self, at, label, action=None):
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        if self.run_lock is None:
+            (action or at).run()
+        else:
+            with self.run_lock:
+                (action or at).run()
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1] - before if self.trace_memory else 0
+        if at.exception:
+            raise RuntimeError(f"{label}: {at.exception[0].message}")
+        self.samples.setdefault(label, []).append((elapsed, peak, payload_bytes(at._tree)))
+
+
+def script_match(at, players, changes, rec, rng):
+    rec.run(at, "initial")
+    for _ in range(4):
+        rec.run(at, "start_quarter", at.button(key="start_btn").click())
+        for _ in range(changes):
+            p = rng.randrange(len(players))
+            rec.run(at, "position_change",
+                    at.radio(key=f"radio_{p}").set_value(rng.choice(CHOICES)))
+            rec.run(at, "tick")
+        rec.run(at, "end_quarter", at.button(key="end_btn").click())
+    rec.run(at, "export_pdf", at.button(key="prepare_pdf").click()
+            if any(b.key == "prepare_pdf" for b in at.button) else None)
+
+
+def summarize(rec):
+    rows = []
+    for label, samples in rec.samples.items():
+        lat = sorted(s[0] * 1000 for s in samples)
+        rows.append((label, len(samples), statistics.median(lat),
+                     lat[min(len(lat) - 1, int(len(lat) * 0.95))],
+                     max(s[1] for s in samples) / 1024, statistics.median(s[2] for s in samples) / 1024))
+    return rows
+
+
+def print_table(title, rows):
+    print(f"\n{title}")
+    print(f"{'stage':<16}{'n':>6}{'p50 ms':>10}{'p95 ms':>10}{'peak KiB':>10}{'payload KiB':>13}")
+    for label, n, p50, p95, peak, size in rows:
+        peak = f"{peak:.0f}" if peak else "-"
+        print(f"{label:<16}{n:>6}{p50:>10.1f}{p95:>10.1f}{peak:>10}{size:>13.1f}")
+
+
+def bench_rosters(sizes, changes, seed, trace_memory):
+    if trace_memory:
+        tracemalloc.start()
+    for n in sizes:
+        players = [f"Player {i + 1}" for i in range(n)]
+        rec = Recorder(trace_memory)
+        script_match(new_session(players), players, changes, rec, random.Random(seed))
+        print_table(f"{n} players, {changes} changes per quarter", summarize(rec))
+    if trace_memory:
+        tracemalloc.stop()
+
+
+def bench_load(coaches, players_per_team, duration, autorefresh, seed):
+    """N coaches on N matches in one process, each rerunning once a second.
+
+    AppTest owns a process-global runtime, so script runs are serialized
+    through one lock. That models a single GIL-bound server process: the
+    reported latency includes time spent queued behind other coaches.
+    """
+    rec = Recorder(trace_memory=False)
+    lock = threading.Lock()
+    run_lock = threading.Lock()
+    lag = []
+
+    def coach(i):
+        rng = random.Random(seed + i)
+        players = [f"Player {k + 1}" for k in range(players_per_team)]
+        at = new_session(players, autorefresh)
+        local = Recorder(trace_memory=False, run_lock=run_lock)
+        local.run(at, "initial")
+        local.run(at, "start_quarter", at.button(key="start_btn").click())
+        deadline = time.perf_counter() + duration
+        next_tick = time.perf_counter()
+        while time.perf_counter() < deadline:
+            next_tick += 1.0
+            if rng.random() < 0.2:
+                p = rng.randrange(len(players))
+                local.run(at, "position_change",
+                          at.radio(key=f"radio_{p}").set_value(rng.choice(CHOICES)))
+            elif autorefresh:
+                local.run(at, "tick")
+            sleep = next_tick - time.perf_counter()
+            with lock:
+                lag.append(max(0.0, -sleep))
+            if sleep > 0:
+                time.sleep(sleep)
+        with lock:
+            for label, samples in local.samples.items():
+                rec.samples.setdefault(label, []).extend(samples)
+
+    threads = [threading.Thread(target=coach, args=(i,)) for i in range(coaches)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    mode = "autorefresh" if autorefresh else "client clock"
+    print_table(f"load: {coaches} coaches × {players_per_team} players, {duration}s, {mode}",
+                summarize(rec))
+    print(f"tick lag: p50 {statistics.median(lag) * 1000:.0f} ms, max {max(lag) * 1000:.0f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--players", type=int, nargs="+", default=[4, 8, 16, 25])
+    parser.add_argument("--changes", type=int, default=10, help="position changes per quarter")
+    parser.add_argument("--load", type=int, metavar="N", help="simulate N concurrent coaches")
+    parser.add_argument("--duration", type=int, default=20, help="load test length in seconds")
+    parser.add_argument("--autorefresh", action="store_true",
+                        help="load test with the 1 Hz full-rerun clock instead of the client clock")
+    parser.add_argument("--memory", action="store_true",
+                        help="record per-rerun allocation peaks (tracemalloc slows every rerun)")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    if args.load:
+        bench_load(args.load, args.players[-1], args.duration, args.autorefresh, args.seed)
+    else:
+        bench_rosters(args.players, args.changes, args.seed, args.memory)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+import html
+import threading
+import time
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+from assets import stylesheet
+from club import live_match
+from live_clock import render_live_clock
+from match_model import Position
+from match_view import MatchView
+
+# ---------------------------------------------------------------------
+# Live broadcast to spectators
+#
+# One coach session per match is the writer; everyone else (assistant
+# coaches, the team manager, parents) opens the read-only ?watch=<match>
+# link. Each match has one process-wide channel. It derives the spectator
+# frame from the shared MatchLog at most once per log revision and caches
+# the rendered HTML with it, so every viewer of that revision gets the
+# same string. A viewer's page is a single fragment that checks the
+# channel's version every few seconds and otherwise lets the client-side
+# clock tick. A poll with no new event costs a dict lookup and a cached
+# string, which is what lets one server carry hundreds of viewers.
+# ---------------------------------------------------------------------
+# The writer's page renews its lease every HEARTBEAT_SECS while it is open
+# (a tiny timed fragment, so an idle page keeps it too); another coach
+# session may take over once a writer has been gone for WRITER_LEASE
+HEARTBEAT_SECS = 30
+WRITER_LEASE = 4 * HEARTBEAT_SECS
+# Seconds between spectator version checks
+POLL_SECS = 2
+
+
+class MatchChannel:
+    def __init__(self, match_id):
+        self.match_id = match_id
+        self._lock = threading.Lock()
+        self._view = None
+        self._version = None
+        self._frame = None
+        self._writer = None       # (session id, last seen)
+
+    # --- writer lease ------------------------------------------------
+    def claim(self, session_id, force=False, now=None):
+        """Make `session_id` the writer if the lease is free. Returns True if it holds it."""
+        now = time.time() if now is None else now
+        with self._lock:
+            holder = self._writer
+            if force or holder is None or holder[0] == session_id or now - holder[1] > WRITER_LEASE:
+                self._writer = (session_id, now)
+                return True
+            return False
+
+    def release(self, session_id):
+        with self._lock:
+            if self._writer and self._writer[0] == session_id:
+                self._writer = None
+
+    # --- spectator frames --------------------------------------------
+    def frame(self):
+        """Latest spectator frame, rebuilt only when the match has changed."""
+        log = live_match(self.match_id)
+        with self._lock:
+            version = (id(log), log.revision)
+            if version != self._version:
+                if self._view is None or self._view.log is not log:
+                    self._view = MatchView(log)
+                self._frame = self._build(log, self._view.compute(time.time()))
+                self._version = version
+            return self._frame
+
+    @staticmethod
+    def _build(log, snap):
+        state = log.state()
+        fmt = log.format
+        names = snap["names"]
+        cols = []
+        for category in fmt.columns:
+            cards = "".join(
+                f"<div class='tt-card'>{html.escape(names[p])} | "
+                f"<span class='tt-pct-{p}'>{snap['pct'][p]:.0f}%</span></div>"
+                for p in snap["columns"][category])
+            bg, fg = fmt.colors[category]
+            cols.append(f"<div class='tt-col'><div class='tt-col-head' "
+                        f"style='background-color:{bg};color:{fg}'>"
+                        f"{html.escape(fmt.labels[category])}</div>{cards}</div>")
+        status = ("Match Finished" if state.finished
+                  else f"{fmt.period_name} {state.quarter}" + ("" if state.running else " · waiting to start"))
+        return {
+            "now": snap["now"],
+            "running": state.running,
+            "quarter_secs": snap["quarter_secs"],
+            "match_secs": snap["match_secs"],
+            "totals": snap["totals"],
+            "on": snap["positions"] != Position.OFF,
+            "status": status,
+            "html": f"<div class='tt-columns'>{''.join(cols)}</div>",
+        }
+
+
+@st.cache_resource(ttl=6 * 3600, max_entries=500, show_spinner=False)
+def match_channel(match_id):
+    """The one broadcast channel for a match."""
+    return MatchChannel(match_id)
+
+
+def session_id():
+    ctx = get_script_run_ctx()
+    return ctx.session_id if ctx else None
+
+
+def share_link(match_id):
+    return f"?watch={match_id}"
+
+
+@st.fragment(run_every=POLL_SECS)
+def spectator_view(match_id):
+    """Read-only live view of a match, refreshed from its channel."""
+    frame = match_channel(match_id).frame()
+    now = time.time()
+    dt = max(0.0, now - frame["now"]) if frame["running"] else 0.0
+    quarter = frame["quarter_secs"] + dt if frame["running"] else 0.0
+    m, s = divmod(int(quarter), 60)
+    st.markdown(
+        f"<div class='tt-watch-head'><h1>Time on Ground</h1>"
+        f"<div class='tt-timer'>{m:02d}:{s:02d}</div></div>"
+        f"<div class='tt-watch-status'>{frame['status']}</div>{frame['html']}",
+        unsafe_allow_html=True)
+    if frame["running"]:
+        render_live_clock(now, quarter, frame["match_secs"] + dt,
+                          zip(frame["totals"] + dt * frame["on"], frame["on"]))
+
+
+def spectator_page(match_id):
+    """Entry point for ?watch=<match> links; no login needed."""
+    st.markdown(stylesheet("styles/app.css"), unsafe_allow_html=True)
+    try:
+        live_match(match_id)
+    except KeyError:
+        st.error("This match link is not valid.")
+        return
+    spectator_view(match_id)
@@ -0,0 +1,60 @@
+import streamlit as st
+from match_log import MatchLog
+from storage import get_store
+
+# ---------------------------------------------------------------------
+# Club-wide shared state
+#
+# Teams, rosters and matches are keyed entities in the store. Sessions only
+# keep the ids they are working with; the heavy objects live in
+# process-level caches shared by every tab, so memory grows with the number
+# of active matches rather than the number of open browser sessions. Both
+# caches are bounded and expire idle entries; an evicted match simply
+# reloads from the store on next use (every event is written through).
+# ---------------------------------------------------------------------
+DEFAULT_PLAYERS = ["Player Name 1","Player Name 2","Player Name 3","Player Name 4"]
+
+@st.cache_data(ttl=600, max_entries=1000, show_spinner=False)
+def team_squad(team_id):
+    """A team's active players (list of dicts with id, name and number)."""
+    return get_store().squad(team_id)
+
+def rosters_changed():
+    team_squad.clear()
+
+def update_squad(team_id, players):
+    """Diff-update a team's squad; returns what changed (see SQLiteMatchStore.update_squad)."""
+    changes = get_store().update_squad(team_id, players)
+    rosters_changed()
+    return changes
+
+@st.cache_resource(ttl=6 * 3600, max_entries=500, show_spinner=False)
+def live_match(match_id):
+    """The one shared MatchLog for a match, loaded from the store on first use."""
+    store = get_store()
+    saved = store.load_match(match_id)
+    if saved is None:
+        raise KeyError(match_id)
+    return MatchLog(saved["events"], store, match_id, saved["players"], saved["player_ids"],
+                    saved["format"])
+
+def new_match(team_id, players=None):
+    """Create a match for a team and return its id.
+
+    `players` is the match-day selection: squad dicts (keeping their ids)
+    or plain names. Defaults to the whole active squad. The match is played
+    in the team's current format.
+    """
+    if players is None:
+        players = team_squad(team_id) or DEFAULT_PLAYERS
+    names = [p["name"] if isinstance(p, dict) else p for p in players]
+    ids = [p.get("id") if isinstance(p, dict) else None for p in players]
+    store = get_store()
+    return store.create_match(names, team_id, ids, store.team_format(team_id))
+
+def find_match(team_id, match_id=None):
+    """`match_id` if it belongs to the team, else the team's latest match."""
+    store = get_store()
+    if match_id and store.match_team(match_id) == team_id:
+        return match_id
+    return store.latest_match(team_id)
@@ -0,0 +1 @@
+# Lets tests/ import the app's top-level modules.
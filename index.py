@@ -1,6 +1,8 @@
 import streamlit as st
 from login import login_page
 from teamtracker import main_app
+from broadcast import spectator_page
+from auth import restore_session
 
 # -----------------------------------------------------------------------------
 # Page Config (must be the first Streamlit call in your app)
@@ -19,9 +21,12 @@ if "authenticated" not in st.session_state:
     st.session_state.authenticated = False
 
 # -----------------------------------------------------------------------------
-# Route to login or main app based on authentication
+# Route to the spectator view, login or main app. A session token from an
+# earlier login (cookie) signs a reconnecting or new tab straight back in.
 # -----------------------------------------------------------------------------
-if not st.session_state.authenticated:
+if "watch" in st.query_params:
+    spectator_page(st.query_params["watch"])
+elif not restore_session():
     login_page()
 else:
     main_app()
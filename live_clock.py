@@ -0,0 +1,61 @@
+import json
+import streamlit as st
+import streamlit.components.v1 as components
+
+# ---------------------------------------------------------------------
+# Client-side match clock
+#
+# Instead of re-running the whole script once a second, the server renders
+# the match once per real event and hands this component a snapshot taken
+# at render time. The browser then ticks the header timer and the player
+# card percentages itself, by finding the `tt-timer` / `tt-pct-<i>`
+# elements in the page and extrapolating from the snapshot.
+# ---------------------------------------------------------------------
+_SCRIPT = """
+<script>
+(function() {
+  const snap = %s;
+  const doc = window.parent.document;
+  const offset = Date.now() - snap.now * 1000;   // browser/server clock skew
+  const fmt = (secs) => {
+    secs = Math.max(0, Math.floor(secs));
+    const m = Math.floor(secs / 60), s = secs %% 60;
+    return String(m).padStart(2, "0") + ":" + String(s).padStart(2, "0");
+  };
+  function tick() {
+    const dt = Math.max(0, (Date.now() - offset) / 1000 - snap.now);
+    const timer = doc.querySelector(".tt-timer");
+    if (timer) timer.textContent = fmt(snap.quarter + dt);
+    const match = snap.match + dt;
+    snap.players.forEach(([base, on], i) => {
+      const el = doc.querySelector(".tt-pct-" + i);
+      if (!el) return;
+      const pct = match > 0 ? (base + (on ? dt : 0)) / match * 100 : 0;
+      el.textContent = pct.toFixed(0) + "%%";
+    });
+  }
+  tick();
+  setInterval(tick, 1000);
+})();
+</script>
+"""
+
+
+def render_live_clock(now, quarter_elapsed, match_elapsed, players):
+    """Start the browser-side ticker.
+
+    `players` is a list of (seconds on ground, on field?) pairs in roster
+    order, matching the `tt-pct-<i>` classes used by the player cards.
+    """
+    snap = {
+        "now": now,
+        "quarter": quarter_elapsed,
+        "match": match_elapsed,
+        "players": [[round(base, 3), bool(on)] for base, on in players],
+    }
+    html = _SCRIPT % json.dumps(snap)
+    # st.iframe replaces the deprecated components.html on newer Streamlit
+    if hasattr(st, "iframe"):
+        st.iframe(html, height=1)
+    else:
+        components.html(html, height=0)
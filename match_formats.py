@@ -0,0 +1,65 @@
+import json
+import os
+
+# ---------------------------------------------------------------------
+# Match formats
+#
+# Codes and age groups differ in how many periods they play and for how
+# long, in their on-field positions and in their interchange rules.
+# Formats are data in formats.json: periods, period length, positions as
+# (label, short, colour), and interchange ("rolling" allows changes at
+# any time; "breaks" only between periods, with the planner's window and
+# move limit). Every lookup table the pages need (labels, radio choices,
+# short → index, colours, column order, period labels) is built once per
+# format when the module loads, so a rerun only does dict lookups and
+# adding a format is a data change. Position index 0 is always Off, which
+# matches Position.OFF in match_model.py.
+# ---------------------------------------------------------------------
+FORMATS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "formats.json")
+DEFAULT_FORMAT = "afl"
+OFF = ("Off", "Off", "black")
+
+
+class MatchFormat:
+    def __init__(self, key, spec):
+        self.key = key
+        self.name = spec["name"]
+        self.periods = int(spec["periods"])
+        self.period_minutes = float(spec["period_minutes"])
+        self.period_name = spec.get("period_name", "Period")
+        self.interchange = spec.get("interchange", "rolling")
+        self.interchange_secs = float(spec.get("interchange_minutes", 4)) * 60
+        self.max_changes = int(spec.get("max_changes", 4))
+        slots = (OFF,) + tuple(tuple(p) for p in spec["positions"])
+        # Precomputed tables
+        self.n_positions = len(slots)
+        self.labels = tuple(label for label, _, _ in slots)
+        self.shorts = tuple(short for _, short, _ in slots)
+        self.colors = tuple((color, "white") for _, _, color in slots)
+        self.by_short = {short: i for i, short in enumerate(self.shorts)}
+        self.by_label = {label: i for i, label in enumerate(self.labels)}
+        self.on_field = tuple(range(1, self.n_positions))
+        # Columns on the match page: Off first, then the field back to front
+        self.columns = (0,) + tuple(reversed(self.on_field))
+        self.period_secs = self.period_minutes * 60
+        self.period_labels = tuple(f"{self.period_name[0]}{q}" for q in range(1, self.periods + 1))
+
+    @property
+    def rolling(self):
+        return self.interchange == "rolling"
+
+    def is_last(self, period):
+        return period >= self.periods
+
+
+def load_formats(path=FORMATS_PATH):
+    with open(path) as f:
+        return {key: MatchFormat(key, spec) for key, spec in json.load(f).items()}
+
+
+FORMATS = load_formats()
+
+
+def get_format(key=None):
+    """The format for `key`, falling back to the default for unknown keys."""
+    return FORMATS.get(key or DEFAULT_FORMAT, FORMATS[DEFAULT_FORMAT])
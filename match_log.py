@@ -0,0 +1,237 @@
+import bisect
+import threading
+import time
+import numpy as np
+from match_model import MatchState, Position, to_position
+from match_formats import get_format
+
+# ---------------------------------------------------------------------
+# Append-only match event log
+#
+# Match state is never mutated on a clock tick. Every change (quarter
+# start/end, position change, match restart) is appended to the log with a
+# timestamp, and per-player totals are folded from the log on demand. The
+# fold is cached, so each render only applies events added since the last.
+# Events name players by roster index and positions by slot index in the
+# match's format (see match_formats.py; 0 is Off); the folded state is a
+# MatchState (see match_model.py). The state is checkpointed at every
+# quarter start, so Restart Quarter restores a copy instead of refolding
+# the whole match.
+#
+# A log can be bound to a store (see storage.py); new events are then
+# written through on append and truncations are mirrored. Logs may be
+# shared by several sessions watching the same match (see club.py), so
+# every mutation and fold takes the log's lock.
+#
+# Devices working offline queue events with their own timestamps and an
+# id, and sync them later in batches (see offline_sync.py). merge() drops
+# ids it has already seen, slots the rest into the log by time and refolds
+# from the nearest checkpoint, so late events still land in the right
+# stint. Replayed duplicates (a second Start from another device, a
+# position a player already holds) fold as no-ops.
+# ---------------------------------------------------------------------
+QUARTER_START = "quarter_start"
+QUARTER_END = "quarter_end"
+POSITION = "position"
+RESTART = "restart"
+
+
+def _player_id(players, value):
+    """Roster index for an event's player (legacy logs stored the name)."""
+    if isinstance(value, str):
+        return players.index(value)
+    return int(value)
+
+
+def _apply(state, event, players):
+    kind, t = event["kind"], event["t"]
+    if kind == POSITION:
+        p, new_pos = _player_id(players, event["player"]), to_position(event["position"])
+        if state.running:
+            state.advance(t)
+        # Only count Off → On as a rotation
+        if state.running and state.position[p] == Position.OFF and new_pos != Position.OFF:
+            state.rotations[p] += 1
+        state.position[p] = new_pos
+    elif kind == QUARTER_START:
+        if state.running or state.finished:
+            return
+        state.running = True
+        state.quarter_start = t
+        state.since = t
+        # bump existing on‑field
+        state.rotations[state.position != Position.OFF] += 1
+    elif kind == QUARTER_END:
+        if not state.running:
+            return
+        state.advance(t)
+        q = state.quarter
+        state.durations[q] = t - state.quarter_start
+        state.reports[q] = state.time.copy()
+        state.running = False
+        if event.get("last"):
+            state.finished = True
+        else:
+            state.quarter += 1
+    elif kind == RESTART:
+        fresh = MatchState.empty(state.n_players, state.n_positions)
+        for name in MatchState.__slots__:
+            setattr(state, name, getattr(fresh, name))
+
+
+class MatchLog:
+    def __init__(self, events=None, store=None, match_id=None, players=None, player_ids=None,
+                 format_key=None):
+        self.events = list(events or [])
+        self.store = store
+        self.match_id = match_id
+        self.players = list(players or [])
+        # Squad ids of the match-day players (None for ad-hoc names)
+        self.player_ids = list(player_ids or [None] * len(self.players))
+        self.format = get_format(format_key)
+        # revision bumps on every change; generation only when history is rewritten
+        self.revision = 0
+        self.generation = 0
+        self.lock = threading.RLock()
+        self._state = MatchState.empty(len(self.players), self.format.n_positions)
+        self._folded = 0
+        self._checkpoints = {}     # event index -> state before that QUARTER_START
+        self._saved = len(self.events)
+        self._ids = {e["id"] for e in self.events if "id" in e}
+
+    def append(self, kind, **data):
+        """Record an event. Timestamps never go backwards within a log."""
+        with self.lock:
+            t = time.time()
+            if self.events and t < self.events[-1]["t"]:
+                t = self.events[-1]["t"]
+            event = {"t": t, "kind": kind, **data}
+            self.events.append(event)
+            self.revision += 1
+            self.flush()
+            return event
+
+    def flush(self):
+        """Write unsaved events to the bound store in one batch."""
+        with self.lock:
+            if self.store is not None and self._saved < len(self.events):
+                self.store.append_events(self.match_id, self._saved, self.events[self._saved:])
+                self._saved = len(self.events)
+
+    def state(self):
+        """Fold in events added since the last call and return the match state."""
+        with self.lock:
+            for i in range(self._folded, len(self.events)):
+                event = self.events[i]
+                if event["kind"] == QUARTER_START:
+                    self._checkpoints[i] = self._state.copy()
+                _apply(self._state, event, self.players)
+            self._folded = len(self.events)
+            return self._state
+
+    def truncate(self, n):
+        """Drop every event from index n onwards."""
+        with self.lock:
+            del self.events[n:]
+            self.revision += 1
+            self.generation += 1
+            if self.store is not None and n < self._saved:
+                self.store.truncate_events(self.match_id, n)
+                self._saved = n
+            self._ids = {e["id"] for e in self.events if "id" in e}
+            self._rewind(n)
+
+    def _rewind(self, n):
+        """Make the next fold restart at or before event index n."""
+        if n >= self._folded:
+            return
+        start = max((i for i in self._checkpoints if i <= n), default=None)
+        if start is None:
+            self._state = MatchState.empty(len(self.players), self.format.n_positions)
+            self._folded = 0
+            self._checkpoints = {}
+        else:
+            self._state = self._checkpoints[start].copy()
+            self._folded = start
+            self._checkpoints = {i: c for i, c in self._checkpoints.items() if i <= start}
+
+    def merge(self, events):
+        """Insert events recorded elsewhere by their timestamps.
+
+        Events carry an "id"; ones already in the log are skipped, so a
+        batch can be resent safely. Returns how many were added.
+        """
+        with self.lock:
+            new = sorted((e for e in events if e["id"] not in self._ids), key=lambda e: e["t"])
+            if not new:
+                return 0
+            keys = [e["t"] for e in self.events]
+            first = len(self.events)
+            for event in new:
+                i = bisect.bisect_right(keys, event["t"])
+                keys.insert(i, event["t"])
+                self.events.insert(i, event)
+                self._ids.add(event["id"])
+                first = min(first, i)
+            self.revision += 1
+            if first < len(self.events) - len(new):
+                self.generation += 1
+            if self.store is not None and first < self._saved:
+                # Rewrite the tail in one transaction, so a crash never leaves it cut short
+                self.store.replace_events(self.match_id, first, self.events[first:])
+                self._saved = len(self.events)
+            self.flush()
+            self._rewind(first)
+            return len(new)
+
+    def restart_quarter(self):
+        """Truncate the log back to the start of the current quarter."""
+        with self.lock:
+            q = self.state().quarter
+            # Only the events since the last restart belong to this match
+            first = next((i + 1 for i in range(len(self.events) - 1, -1, -1)
+                          if self.events[i]["kind"] == RESTART), 0)
+            # Starts and ends are counted the way _apply counts them
+            current, running = 1, False
+            for i in range(first, len(self.events)):
+                kind = self.events[i]["kind"]
+                if kind == QUARTER_START and not running:
+                    if current == q:
+                        self.truncate(i)
+                        return True
+                    running = True
+                elif kind == QUARTER_END and running:
+                    running = False
+                    if self.events[i].get("last"):
+                        break
+                    current += 1
+            return False
+
+    def rename_player(self, player, name):
+        """Rename a player in place; their id and history are unchanged."""
+        with self.lock:
+            self.players[player] = name
+            self.revision += 1
+
+    def times(self, now=None):
+        """players × positions seconds, including the running stint."""
+        with self.lock:
+            state = self.state()
+            if not state.running:
+                return state.time.copy()
+            now = time.time() if now is None else now
+            live = state.time.copy()
+            live[np.arange(state.n_players), state.position] += max(0.0, now - state.since)
+            return live
+
+    def quarter_elapsed(self, now=None):
+        state = self.state()
+        if not state.running:
+            return 0.0
+        now = time.time() if now is None else now
+        return max(0.0, now - state.quarter_start)
+
+    def match_elapsed(self, now=None):
+        """Total match seconds: completed quarters plus the running one."""
+        state = self.state()
+        return sum(state.durations.values()) + self.quarter_elapsed(now)
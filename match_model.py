@@ -0,0 +1,90 @@
+from dataclasses import dataclass, field
+from enum import IntEnum
+import numpy as np
+
+# ---------------------------------------------------------------------
+# Typed match model
+#
+# Players are identified by their integer index in the match roster, so
+# renames and duplicate names are harmless. Positions are a small IntEnum
+# that doubles as a column index, and all per-player numbers live in fixed
+# size arrays (players × positions for time), so copying a snapshot,
+# pickling the session or crediting a tick to everyone on the field is a
+# handful of array operations rather than walks over nested dicts.
+#
+# The Position enum names the default format's slots. Other formats (see
+# match_formats.py) have their own position sets; their states are sized
+# to the format, and index 0 is Off everywhere.
+# ---------------------------------------------------------------------
+class Position(IntEnum):
+    OFF = 0
+    FORWARD = 1
+    MIDFIELD = 2
+    DEFENCE = 3
+
+    @property
+    def label(self):
+        return LABELS[self]
+
+    @property
+    def short(self):
+        return SHORT[self]
+
+
+LABELS = ("Off", "Forward", "Midfield", "Defence")
+SHORT = ("Off", "FWD", "MID", "DEF")
+BY_LABEL = {label: Position(i) for i, label in enumerate(LABELS)}
+BY_SHORT = {short: Position(i) for i, short in enumerate(SHORT)}
+ON_FIELD = (Position.FORWARD, Position.MIDFIELD, Position.DEFENCE)
+
+
+def to_position(value):
+    """Position index from an int, enum or legacy label string."""
+    if isinstance(value, str):
+        return BY_LABEL[value]
+    return int(value)
+
+
+@dataclass(slots=True)
+class MatchState:
+    time: np.ndarray          # players × positions seconds (Off column = bench time while running)
+    position: np.ndarray      # players, Position values
+    rotations: np.ndarray     # players, Off → On count
+    running: bool = False
+    quarter: int = 1
+    quarter_start: float = 0.0
+    since: float = 0.0        # timestamp `time` is accumulated up to
+    durations: dict = field(default_factory=dict)   # quarter -> seconds
+    reports: dict = field(default_factory=dict)     # quarter -> time array at quarter end
+    finished: bool = False
+
+    @classmethod
+    def empty(cls, n_players, n_positions=len(Position)):
+        return cls(time=np.zeros((n_players, n_positions)),
+                   position=np.zeros(n_players, dtype=np.int8),
+                   rotations=np.zeros(n_players, dtype=np.int32))
+
+    @property
+    def n_players(self):
+        return len(self.position)
+
+    @property
+    def n_positions(self):
+        return self.time.shape[1]
+
+    def copy(self):
+        return MatchState(self.time.copy(), self.position.copy(), self.rotations.copy(),
+                          self.running, self.quarter, self.quarter_start, self.since,
+                          dict(self.durations), dict(self.reports), self.finished)
+
+    def advance(self, t):
+        """Credit every player's current position with the time since `since`."""
+        delta = t - self.since
+        if delta > 0:
+            self.time[np.arange(self.n_players), self.position] += delta
+        self.since = t
+
+    def on_ground(self, time=None):
+        """Seconds on the field per player."""
+        time = self.time if time is None else time
+        return time[:, 1:].sum(axis=1)
@@ -0,0 +1,119 @@
+import bisect
+from match_log import POSITION
+from match_model import Position
+
+# ---------------------------------------------------------------------
+# Derived match view
+#
+# Everything the match page shows is derived from the event log once per
+# rerun: per-player totals, game %, the report rows and the players in each
+# category column, already in display order.
+#
+# Column order is kept incrementally. Off players are ordered by their
+# (frozen) total ascending; on-field players by total descending. Everyone
+# on the field gains time at the same rate, so their order never changes
+# on its own; sorting them by (total - match clock), which stays constant
+# while they are on, means a position change only has to move the one
+# player with a bisect instead of re-sorting every column. Columns are
+# the match format's positions (see match_formats.py), Off first.
+# ---------------------------------------------------------------------
+class MatchView:
+    def __init__(self, log):
+        self.log = log
+        self._revision = None
+        self._generation = None
+        self._seen = 0
+        self._order = {}      # category -> sorted [(key, player id)]
+        self._where = {}      # player id -> (category, entry)
+
+    def _entry(self, p, category, totals, match_secs):
+        if category == Position.OFF:
+            return (float(totals[p]), p)
+        return (-float(totals[p] - match_secs), p)
+
+    def _rebuild(self, state, totals, match_secs):
+        self._order = {c: [] for c in self.log.format.columns}
+        self._where = {}
+        for p in range(state.n_players):
+            category = int(state.position[p])
+            entry = self._entry(p, category, totals, match_secs)
+            self._order[category].append(entry)
+            self._where[p] = (category, entry)
+        for entries in self._order.values():
+            entries.sort()
+
+    def _move(self, p, state, totals, match_secs):
+        old_cat, old_entry = self._where[p]
+        self._order[old_cat].remove(old_entry)
+        category = int(state.position[p])
+        entry = self._entry(p, category, totals, match_secs)
+        bisect.insort(self._order[category], entry)
+        self._where[p] = (category, entry)
+
+    def _sync(self, state, totals, match_secs):
+        log = self.log
+        if self._revision == log.revision:
+            return
+        new_events = log.events[self._seen:]
+        incremental = (self._generation == log.generation
+                       and len(self._where) == state.n_players
+                       and all(e["kind"] == POSITION and isinstance(e["player"], int)
+                               for e in new_events))
+        if incremental:
+            for p in {e["player"] for e in new_events}:
+                self._move(p, state, totals, match_secs)
+        else:
+            self._rebuild(state, totals, match_secs)
+        self._revision = log.revision
+        self._generation = log.generation
+        self._seen = len(log.events)
+
+    def compute(self, now):
+        """Snapshot of everything the match page renders at time `now`."""
+        log = self.log
+        with log.lock:
+            state = log.state()
+            match_secs = log.match_elapsed(now)
+            times = log.times(now)
+            totals = state.on_ground(times)
+            self._sync(state, totals, match_secs)
+            columns = {c: [p for _, p in entries] for c, entries in self._order.items()}
+            positions = state.position.copy()
+            rotations = state.rotations.copy()
+            revision = log.revision
+            names = list(log.players)
+            match_format = log.format
+        pct = totals / match_secs * 100 if match_secs > 0 else totals * 0
+        return {
+            "revision": revision,
+            "now": now,
+            "match_secs": match_secs,
+            "quarter_secs": log.quarter_elapsed(now),
+            "names": names,
+            "format": match_format,
+            "times": times,
+            "totals": totals,
+            "pct": pct,
+            "positions": positions,
+            "rotations": rotations,
+            "columns": columns,
+        }
+
+    @staticmethod
+    def report_rows(snap, fmt):
+        """Report table rows, highest game % first."""
+        rows = []
+        match_format = snap["format"]
+        order = sorted(range(len(snap["names"])), key=lambda p: snap["pct"][p], reverse=True)
+        for p in order:
+            t = snap["times"][p]
+            row = {"Player": snap["names"][p]}
+            for pos in match_format.on_field:
+                row[match_format.shorts[pos]] = fmt(t[pos])
+            row.update({
+                "Total": fmt(snap["totals"][p]),
+                "Pct (Game)": f"{snap['pct'][p]:.0f}%",
+                "Rotations": int(snap["rotations"][p]),
+            })
+            rows.append(row)
+        return rows
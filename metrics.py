@@ -0,0 +1,234 @@
+import functools
+import logging
+import os
+import pickle
+import threading
+import time
+from contextlib import contextmanager
+import streamlit as st
+from assets import STATIC_DIR, STATIC_URL
+from broadcast import session_id
+
+# ---------------------------------------------------------------------
+# Instrumentation
+#
+# Each rerun is timed as a whole and in named stages (css, sidebar,
+# header, player_columns, report_table, ...), both wall clock and script
+# thread CPU time. Timings go into one process-wide registry labelled by
+# team and session, along with rerun counts, session-state size (sampled
+# every SIZE_SAMPLE reruns, because pickling is not free) and how late
+# each autorefresh tick arrived. The admin panel reads the registry. A
+# background thread renders it in Prometheus text format every EXPORT_SECS
+# (series are per team; session ids never leave the process): set
+# TEAMTRACKER_METRICS_LOG=1 to log it, or TEAMTRACKER_METRICS_PUBLISH=1 to
+# write it to app/static/metrics.txt, which anyone can fetch. Recording is
+# a few dict updates under a lock.
+# ---------------------------------------------------------------------
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+SIZE_SAMPLE = 20
+EXPORT_SECS = 15
+SESSION_TTL = 3600
+METRICS_FILE = "metrics.txt"
+
+log = logging.getLogger("teamtracker.metrics")
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.stages = {}      # (stage, team) -> [count, wall, cpu, bucket counts]
+        self.sessions = {}    # session id -> dict of per-session figures
+
+    def observe(self, stage, team, wall, cpu):
+        with self._lock:
+            entry = self.stages.get((stage, team))
+            if entry is None:
+                entry = self.stages[(stage, team)] = [0, 0.0, 0.0, [0] * len(BUCKETS)]
+            entry[0] += 1
+            entry[1] += wall
+            entry[2] += cpu
+            for i, bound in enumerate(BUCKETS):
+                if wall <= bound:
+                    entry[3][i] += 1
+
+    def session(self, sid, team):
+        """The mutable per-session record (created on first use)."""
+        with self._lock:
+            rec = self.sessions.get(sid)
+            if rec is None:
+                rec = self.sessions[sid] = {"team": team, "reruns": 0, "wall": 0.0, "cpu": 0.0,
+                                            "state_bytes": 0, "tick_lag": 0.0, "seen": 0.0}
+            rec["team"] = team
+            return rec
+
+    def prune(self, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            for sid in [s for s, r in self.sessions.items() if now - r["seen"] > SESSION_TTL]:
+                del self.sessions[sid]
+
+    def by_team(self):
+        """{team: {"sessions", "reruns", "wall", "cpu"}} over live sessions."""
+        out = {}
+        with self._lock:
+            for rec in self.sessions.values():
+                t = out.setdefault(rec["team"], {"sessions": 0, "reruns": 0, "wall": 0.0, "cpu": 0.0})
+                t["sessions"] += 1
+                t["reruns"] += rec["reruns"]
+                t["wall"] += rec["wall"]
+                t["cpu"] += rec["cpu"]
+        return out
+
+    def prometheus(self):
+        """All metrics in Prometheus text exposition format."""
+        lines = [
+            "# HELP teamtracker_stage_seconds Render stage wall time.",
+            "# TYPE teamtracker_stage_seconds histogram",
+        ]
+        with self._lock:
+            stages = {k: (v[0], v[1], v[2], list(v[3])) for k, v in self.stages.items()}
+            sessions = {s: dict(r) for s, r in self.sessions.items()}
+        for (stage, team), (count, wall, cpu, buckets) in sorted(stages.items()):
+            labels = f'stage="{stage}",team="{team}"'
+            for bound, n in zip(BUCKETS, buckets):
+                lines.append(f'teamtracker_stage_seconds_bucket{{{labels},le="{bound}"}} {n}')
+            lines.append(f'teamtracker_stage_seconds_bucket{{{labels},le="+Inf"}} {count}')
+            lines.append(f"teamtracker_stage_seconds_sum{{{labels}}} {wall:.6f}")
+            lines.append(f"teamtracker_stage_seconds_count{{{labels}}} {count}")
+        lines += ["# HELP teamtracker_stage_cpu_seconds_total Render stage script-thread CPU time.",
+                  "# TYPE teamtracker_stage_cpu_seconds_total counter"]
+        for (stage, team), (_, _, cpu, _) in sorted(stages.items()):
+            lines.append(f'teamtracker_stage_cpu_seconds_total{{stage="{stage}",team="{team}"}} {cpu:.6f}')
+        # Per team, not per session: session ids are reattach keys and unbounded.
+        # Rerun counts and CPU are the stage="rerun" series above.
+        teams = {}
+        for rec in sessions.values():
+            t = teams.setdefault(rec["team"], [0, 0, 0.0])
+            t[0] += 1
+            t[1] = max(t[1], rec["state_bytes"])
+            t[2] = max(t[2], rec["tick_lag"])
+        for name, i, help_text in (
+                ("sessions", 0, "Live sessions."),
+                ("session_state_bytes_max", 1, "Largest pickled session-state size."),
+                ("tick_lag_seconds_max", 2, "Latest autorefresh tick lateness, worst session.")):
+            lines += [f"# HELP teamtracker_{name} {help_text}", f"# TYPE teamtracker_{name} gauge"]
+            for team, values in sorted(teams.items()):
+                lines.append(f'teamtracker_{name}{{team="{team}"}} {values[i]}')
+        return "\n".join(lines) + "\n"
+
+
+def _export_loop(reg):
+    while True:
+        time.sleep(EXPORT_SECS)
+        reg.prune()
+        text = reg.prometheus()
+        if os.environ.get("TEAMTRACKER_METRICS_LOG"):
+            log.info("metrics\n%s", text)
+        if not os.environ.get("TEAMTRACKER_METRICS_PUBLISH"):
+            continue
+        try:
+            os.makedirs(STATIC_DIR, exist_ok=True)
+            tmp = os.path.join(STATIC_DIR, METRICS_FILE + ".tmp")
+            with open(tmp, "w") as f:
+                f.write(text)
+            os.replace(tmp, os.path.join(STATIC_DIR, METRICS_FILE))
+        except OSError:
+            pass
+
+
+@st.cache_resource(show_spinner=False)
+def registry():
+    """The process-wide registry; starts the exporter thread on first use."""
+    reg = Registry()
+    threading.Thread(target=_export_loop, args=(reg,), daemon=True, name="metrics-export").start()
+    return reg
+
+
+def metrics_url():
+    """Where the metrics are published, or None if they are not."""
+    if not os.environ.get("TEAMTRACKER_METRICS_PUBLISH"):
+        return None
+    return f"{STATIC_URL}/{METRICS_FILE}"
+
+
+# --- recording -------------------------------------------------------
+def _team():
+    return st.session_state.get("team_id") or "-"
+
+
+def _record(name, wall, cpu):
+    registry().observe(name, _team(), wall, cpu)
+    perf = st.session_state.setdefault("perf", {})
+    count, total, _ = perf.get(name, (0, 0.0, 0.0))
+    perf[name] = (count + 1, total + wall, wall)
+
+
+@contextmanager
+def stage(name):
+    """Time a render stage for this session and its team."""
+    wall, cpu = time.perf_counter(), time.thread_time()
+    try:
+        yield
+    finally:
+        _record(name, time.perf_counter() - wall, time.thread_time() - cpu)
+
+
+class Laps:
+    """Consecutive stages of a page: lap(name) closes the stage that just ran."""
+    def __init__(self):
+        self._wall, self._cpu = time.perf_counter(), time.thread_time()
+
+    def lap(self, name):
+        wall, cpu = time.perf_counter(), time.thread_time()
+        _record(name, wall - self._wall, cpu - self._cpu)
+        self._wall, self._cpu = wall, cpu
+
+
+def timed(name):
+    """Decorator form of stage(), e.g. for fragments."""
+    def wrap(func):
+        @functools.wraps(func)
+        def inner(*args, **kwargs):
+            with stage(name):
+                return func(*args, **kwargs)
+        return inner
+    return wrap
+
+
+@contextmanager
+def rerun():
+    """Wrap a whole script run: counts it and charges its time to the session."""
+    wall, cpu = time.perf_counter(), time.thread_time()
+    try:
+        with stage("rerun"):
+            yield
+    finally:
+        rec = registry().session(session_id(), _team())
+        rec["reruns"] += 1
+        rec["wall"] += time.perf_counter() - wall
+        rec["cpu"] += time.thread_time() - cpu
+        rec["seen"] = time.time()
+        if rec["reruns"] % SIZE_SAMPLE == 1:
+            rec["state_bytes"] = state_size()
+
+
+def tick(count, interval):
+    """Record how late an autorefresh tick arrived (count = st_autorefresh's value)."""
+    now = time.time()
+    last = st.session_state.get("perf_tick")
+    if last and count != last[0]:
+        lag = max(0.0, now - last[1] - interval)
+        registry().session(session_id(), _team())["tick_lag"] = round(lag, 4)
+    if not last or count != last[0]:
+        st.session_state.perf_tick = (count, now)
+
+
+def state_size():
+    """Approximate pickled size of this session's state, skipping what won't pickle."""
+    total = 0
+    for key in list(st.session_state.keys()):
+        try:
+            total += len(pickle.dumps(st.session_state[key], protocol=pickle.HIGHEST_PROTOCOL))
+        except Exception:
+            pass
+    return total
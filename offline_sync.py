@@ -0,0 +1,92 @@
+import os
+import time
+import streamlit as st
+import streamlit.components.v1 as components
+from match_log import POSITION, QUARTER_START, QUARTER_END
+
+# ---------------------------------------------------------------------
+# Offline sideline mode
+#
+# A bidirectional component (components/offline_pad, plain HTML talking the
+# Streamlit postMessage protocol) owns the position buttons and the quarter
+# clock button. Taps update the pad immediately and are queued on the
+# device with a server-clock timestamp and a unique id; queued events are
+# sent in batches whenever the device is online and stay queued until a
+# later render acknowledges their ids. The server merges each batch into
+# the shared MatchLog by time (MatchLog.merge), so a change made during a
+# dropout is credited from when it was tapped, not when it arrived.
+# ---------------------------------------------------------------------
+_pad = components.declare_component(
+    "offline_pad",
+    path=os.path.join(os.path.dirname(os.path.abspath(__file__)), "components", "offline_pad"),
+)
+
+SYNCED_KINDS = (POSITION, QUARTER_START, QUARTER_END)
+# Offline events may not claim to be from further back than this
+MAX_EVENT_AGE = 6 * 3600
+
+
+def _clean(event, n_players, n_positions, now):
+    """Validated copy of a device event, or None if it is not one we accept."""
+    if not isinstance(event, dict):
+        return None
+    kind = event.get("kind")
+    if kind not in SYNCED_KINDS or not isinstance(event.get("id"), str):
+        return None
+    try:
+        t = float(event.get("t", now))
+        if kind == POSITION:
+            player, position = int(event["player"]), int(event["position"])
+    except (KeyError, TypeError, ValueError, OverflowError):
+        return None
+    if not now - MAX_EVENT_AGE <= t <= now + 5:
+        return None
+    out = {"t": min(t, now), "kind": kind, "id": event["id"]}
+    if kind == POSITION:
+        if not (0 <= player < n_players and 0 <= position < n_positions):
+            return None
+        out.update(player=player, position=position)
+    elif kind == QUARTER_END:
+        out["last"] = bool(event.get("last"))
+    return out
+
+
+def sync_batch(log, batch):
+    """Merge a batch from the pad. Returns (ids to acknowledge, events added)."""
+    now = time.time()
+    n_players, n_positions = len(log.players), log.format.n_positions
+    raws = batch.get("events")
+    raws = raws if isinstance(raws, list) else []
+    events = [e for e in (_clean(raw, n_players, n_positions, now) for raw in raws)
+              if e is not None]
+    added = log.merge(events)
+    return [raw.get("id") for raw in raws if isinstance(raw, dict)], added
+
+
+def _key(log):
+    return f"offline_pad_{log.match_id}"
+
+
+def sync_offline(log):
+    """Merge the pad's latest batch, once. Returns how many events were new."""
+    key = _key(log)
+    batch = st.session_state.get(key)
+    if not isinstance(batch, dict) or batch.get("batch") == st.session_state.get(f"{key}_seen"):
+        return 0
+    acked, added = sync_batch(log, batch)
+    st.session_state[f"{key}_seen"] = batch["batch"]
+    st.session_state[f"{key}_acked"] = acked
+    return added
+
+
+def offline_pad(log):
+    """Render the pad for a match from its current state and format."""
+    key = _key(log)
+    state = log.state()
+    fmt = log.format
+    _pad(match_id=log.match_id, now=time.time(), names=list(log.players),
+         positions=[int(p) for p in state.position], running=state.running,
+         quarter=state.quarter, finished=state.finished, quarters=fmt.periods,
+         period_name=fmt.period_name, choices=list(fmt.shorts),
+         colors=[bg for bg, _ in fmt.colors],
+         acked=st.session_state.get(f"{key}_acked", []), key=key, default=None)
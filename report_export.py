@@ -0,0 +1,303 @@
+import csv
+import io
+import itertools
+import json
+import multiprocessing
+import os
+import tempfile
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timezone
+from xml.sax.saxutils import escape
+from match_formats import FORMATS as MATCH_FORMATS
+from report_pdf import render_report_pdf
+from season_analytics import field_positions, report_players, season_bounds
+from storage import open_store
+
+# ---------------------------------------------------------------------
+# Report export
+#
+# Exports are pipelines of generators: a row source (one match, a season,
+# a round across the club) reads quarter reports a chunk of matches at a
+# time and yields flat rows, and a writer turns rows into CSV, JSON lines
+# or XLSX chunks as they arrive. spool() drains a pipeline into a
+# temporary file that spills to disk past a few MB, so even a large season
+# is never held in memory as one string. XLSX is written directly as a
+# streamed zip of SpreadsheetML, with no spreadsheet library needed.
+#
+# PDFs (reportlab) need the whole table, so they are built per document.
+# Batch mode renders one PDF per match in a process pool and streams the
+# zip as workers finish. The app passes these as download callables,
+# which Streamlit runs off the script thread.
+#
+# Position columns follow the match format (forward/midfield/defence for
+# AFL); writers take their header from the first row.
+# ---------------------------------------------------------------------
+KEY_FIELDS = ("match", "date", "player_id", "player")
+TOTAL_FIELDS = ("on_ground", "match_secs", "pct", "rotations")
+FIELDS = KEY_FIELDS + ("forward", "midfield", "defence") + TOTAL_FIELDS
+CHUNK_MATCHES = 50
+CHUNK_ROWS = 500
+
+
+# --- row sources -----------------------------------------------------
+def match_rows(store, matches, chunk=CHUNK_MATCHES):
+    """Rows (player × match) from the stored reports of (match_id, created) pairs."""
+    matches = list(matches)
+    for i in range(0, len(matches), chunk):
+        part = matches[i:i + chunk]
+        reports, rosters = store.report_rows([m for m, _ in part])
+        ids = {(m, i): pid for m, i, pid, _ in rosters}
+        ids_by_name = {(m, name): pid for m, _, pid, name in reversed(rosters)}
+        latest, durations = {}, {}
+        for m, q, d, report, rot in reports:
+            durations[m] = durations.get(m, 0.0) + d
+            if q >= latest.get(m, (0,))[0]:
+                latest[m] = (q, report, rot)
+        for m, created in part:
+            if m not in latest:
+                continue
+            _, report, rot = latest[m]
+            secs = durations[m]
+            date = (datetime.fromtimestamp(created, timezone.utc).date().isoformat()
+                    if created else "")
+            indexed = isinstance(report.get("time"), list)
+            for p, (name, times, rotations) in enumerate(report_players(report, rot)):
+                # Squad id (empty for ad-hoc players); legacy reports are keyed by name
+                pid = ids.get((m, p)) if indexed else ids_by_name.get((m, name))
+                row = {"match": m, "date": date, "player_id": pid or "", "player": name}
+                on = 0.0
+                for p in field_positions(times):
+                    row[column(p)] = secs_at = round(float(times.get(p, 0.0)), 1)
+                    on += secs_at
+                on = round(on, 1)
+                row.update(on_ground=on, match_secs=round(secs, 1),
+                           pct=round(on / secs * 100, 1) if secs > 0 else 0.0,
+                           rotations=int(rotations))
+                yield row
+
+
+def column(label):
+    """Export column name of a position label ("Goal Shooter" -> "goal_shooter")."""
+    return label.lower().replace(" ", "_")
+
+
+# Column name -> short label for PDF headers, over every known format
+SHORTS = {column(label): short for fmt in MATCH_FORMATS.values()
+          for label, short in zip(fmt.labels, fmt.shorts)}
+
+
+def _with_fields(rows, fields):
+    """(fields, rows): `fields` if given, else the first row's keys."""
+    rows = iter(rows)
+    if fields is not None:
+        return fields, rows
+    first = next(rows, None)
+    if first is None:
+        return FIELDS, iter(())
+    return tuple(first), itertools.chain([first], rows)
+
+
+def season_rows(store, team_id, season):
+    yield from match_rows(store, store.finished_matches(team_id, *season_bounds(season)))
+
+
+def round_matches(store, day, team_ids=None):
+    """Finished matches created on `day` (a date, UTC) of the given teams (default: all)."""
+    start = datetime(day.year, day.month, day.day, tzinfo=timezone.utc).timestamp()
+    if team_ids is None:
+        return store.finished_matches(None, start, start + 86400)
+    return sorted((m for t in team_ids for m in store.finished_matches(t, start, start + 86400)),
+                  key=lambda m: m[1])
+
+
+# --- writers ---------------------------------------------------------
+def csv_stream(rows, fields=None):
+    fields, rows = _with_fields(rows, fields)
+    out = io.StringIO()
+    writer = csv.DictWriter(out, fieldnames=fields, extrasaction="ignore")
+    writer.writeheader()
+    for n, row in enumerate(rows, 1):
+        writer.writerow(row)
+        if n % CHUNK_ROWS == 0:
+            yield out.getvalue()
+            out.seek(0)
+            out.truncate()
+    yield out.getvalue()
+
+
+def jsonl_stream(rows):
+    batch = []
+    for row in rows:
+        batch.append(json.dumps(row, default=str))
+        if len(batch) == CHUNK_ROWS:
+            yield "\n".join(batch) + "\n"
+            batch = []
+    if batch:
+        yield "\n".join(batch) + "\n"
+
+
+class _Sink:
+    """Write-only, unseekable target; zipfile then streams with data descriptors."""
+    def __init__(self):
+        self.parts = []
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data, self.parts = b"".join(self.parts), []
+        return data
+
+
+_XLSX_PARTS = {
+    "[Content_Types].xml":
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-'
+        'officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-'
+        'officedocument.spreadsheetml.worksheet+xml"/></Types>',
+    "_rels/.rels":
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/'
+        'relationships/officeDocument" Target="xl/workbook.xml"/></Relationships>',
+    "xl/workbook.xml":
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Report" sheetId="1" r:id="rId1"/></sheets></workbook>',
+    "xl/_rels/workbook.xml.rels":
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/'
+        'relationships/worksheet" Target="worksheets/sheet1.xml"/></Relationships>',
+}
+
+
+def _xlsx_row(values):
+    cells = []
+    for v in values:
+        if isinstance(v, (int, float)) and not isinstance(v, bool):
+            cells.append(f"<c><v>{v}</v></c>")
+        else:
+            cells.append(f'<c t="inlineStr"><is><t>{escape(str(v if v is not None else ""))}</t></is></c>')
+    return f"<row>{''.join(cells)}</row>"
+
+
+def xlsx_stream(rows, fields=None):
+    fields, rows = _with_fields(rows, fields)
+    sink = _Sink()
+    with zipfile.ZipFile(sink, "w", zipfile.ZIP_DEFLATED) as zf:
+        for name, xml in _XLSX_PARTS.items():
+            zf.writestr(name, xml)
+        with zf.open("xl/worksheets/sheet1.xml", "w") as sheet:
+            sheet.write(b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                        b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+                        b"<sheetData>")
+            sheet.write(_xlsx_row(fields).encode())
+            for n, row in enumerate(rows, 1):
+                sheet.write(_xlsx_row([row.get(f) for f in fields]).encode())
+                if n % CHUNK_ROWS == 0:
+                    yield sink.drain()
+            sheet.write(b"</sheetData></worksheet>")
+    yield sink.drain()
+
+
+def _pdf_table(rows):
+    table = []
+    for r in rows:
+        line = {"Date": r["date"], "Player": r["player"]}
+        for key, secs in r.items():
+            if key not in KEY_FIELDS and key not in TOTAL_FIELDS:
+                line[SHORTS.get(key, key)] = _mmss(secs)
+        line.update({"Total": _mmss(r["on_ground"]), "Pct (Game)": f"{r['pct']:.0f}%",
+                     "Rotations": r["rotations"]})
+        table.append(line)
+    return table
+
+
+def _mmss(secs):
+    m, s = divmod(int(secs), 60)
+    return f"{m:02d}:{s:02d}"
+
+
+def pdf_stream(rows, title="Time on Ground Report"):
+    yield render_report_pdf(_pdf_table(rows), title)
+
+
+FORMATS = {
+    "CSV": (csv_stream, "text/csv", "csv"),
+    "JSON lines": (jsonl_stream, "application/x-ndjson", "jsonl"),
+    "XLSX": (xlsx_stream, "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", "xlsx"),
+    "PDF": (pdf_stream, "application/pdf", "pdf"),
+}
+
+
+def spool(chunks, max_memory=4 * 1024 * 1024):
+    """Drain a writer into a rewound temp file (in memory up to `max_memory`).
+
+    Returns a BytesIO, or a BufferedReader once it spilled to disk: the
+    only file types st.download_button accepts from a data callable.
+    """
+    memory, disk = io.BytesIO(), None
+    for chunk in chunks:
+        data = chunk.encode() if isinstance(chunk, str) else chunk
+        if disk is None and memory.tell() + len(data) > max_memory:
+            disk = tempfile.TemporaryFile()
+            disk.write(memory.getvalue())
+            memory = None
+        (memory if disk is None else disk).write(data)
+    if disk is None:
+        memory.seek(0)
+        return memory
+    # Spilled: hand out a read-only handle on the (already unlinked) temp file
+    disk.flush()
+    reader = open(os.dup(disk.fileno()), "rb")
+    disk.close()
+    reader.seek(0)
+    return reader
+
+
+def export(rows, fmt):
+    """Downloadable file of `rows` in one of FORMATS (see spool)."""
+    writer, _, _ = FORMATS[fmt]
+    return spool(writer(rows))
+
+
+# --- batch PDFs ------------------------------------------------------
+_worker_stores = {}
+
+def _match_pdf(url, match_id, created):
+    store = _worker_stores.get(url)
+    if store is None:
+        store = _worker_stores[url] = open_store(url)
+    rows = list(match_rows(store, [(match_id, created)]))
+    date = rows[0]["date"] if rows else ""
+    return match_id, date, render_report_pdf(_pdf_table(rows), f"Time on Ground Report {date}")
+
+
+def batch_pdfs(url, matches, workers=None):
+    """Yield (match_id, date, pdf bytes) per match as a process pool finishes them."""
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as pool:
+        futures = [pool.submit(_match_pdf, url, m, created) for m, created in matches]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def pdf_zip_stream(url, matches, workers=None):
+    """Zip of one PDF per match, streamed as the PDFs are rendered."""
+    sink = _Sink()
+    with zipfile.ZipFile(sink, "w", zipfile.ZIP_DEFLATED) as zf:
+        for match_id, date, pdf in batch_pdfs(url, matches, workers):
+            zf.writestr(f"{date}-{match_id[:8]}.pdf", pdf)
+            yield sink.drain()
+    yield sink.drain()
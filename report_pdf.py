@@ -0,0 +1,45 @@
+import hashlib
+import json
+import streamlit as st
+
+# ---------------------------------------------------------------------
+# PDF report export
+#
+# Building the PDF is the most expensive thing the match page can do, so it
+# only happens on request, reportlab is imported inside the builder (off the
+# per-rerun path) and the result is memoized on a digest of the rows.
+# ---------------------------------------------------------------------
+def report_digest(rows):
+    """Stable hash of the report rows (list of dicts)."""
+    payload = json.dumps(rows, sort_keys=True, default=str).encode()
+    return hashlib.sha1(payload).hexdigest()
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def build_report_pdf(digest, _rows, title="Time on Ground Match Report"):
+    """Render the report table to PDF bytes. Cached on `digest`, not `_rows`."""
+    return render_report_pdf(_rows, title)
+
+def render_report_pdf(rows, title="Time on Ground Match Report"):
+    """Uncached PDF render, for batch jobs outside the Streamlit runtime."""
+    from io import BytesIO
+    from reportlab.lib.pagesizes import letter
+    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+    from reportlab.lib import colors
+    from reportlab.lib.styles import getSampleStyleSheet
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=letter)
+    elems, styles = [], getSampleStyleSheet()
+    elems.append(Paragraph(title, styles["Heading2"]))
+    elems.append(Spacer(1,12))
+    if rows:
+        data = [list(rows[0].keys())] + [list(r.values()) for r in rows]
+        tbl = Table(data, repeatRows=1)
+        tbl.setStyle(TableStyle([
+            ("BACKGROUND",(0,0),(-1,0),colors.lightgrey),
+            ("GRID",(0,0),(-1,-1),0.5,colors.grey),
+            ("ALIGN",(0,0),(-1,-1),"CENTER"),
+            ("VALIGN",(0,0),(-1,-1),"MIDDLE"),
+        ]))
+        elems.append(tbl)
+    doc.build(elems)
+    return buffer.getvalue()
@@ -0,0 +1,105 @@
+import csv
+import io
+import json
+
+# ---------------------------------------------------------------------
+# Roster import / export
+#
+# Club rosters travel as flat rows, one per player: team, id, name,
+# number, active. CSV files need a header with at least a `name` column;
+# JSON may be a list of such rows or {team: [names or rows]}. Rows with
+# an id update that player, rows without one are matched by name within
+# their team, so re-importing an edited export never duplicates anyone.
+# ---------------------------------------------------------------------
+FIELDS = ("team", "id", "name", "number", "active")
+
+
+def _row(raw, team=None):
+    if isinstance(raw, str):
+        raw = {"name": raw}
+    if not isinstance(raw, dict):
+        raise ValueError(f"Unexpected roster entry: {raw!r}")
+    row = {k.strip().lower(): v for k, v in raw.items() if k}
+    name = str(row.get("name") or "").strip()
+    if not name:
+        return None
+    number = str(row.get("number") or "").strip()
+    active = str(row.get("active", "true")).strip().lower() not in ("0", "false", "no")
+    return {"team": str(row.get("team") or team or "").strip() or None,
+            "id": str(row.get("id") or "").strip() or None,
+            "name": name,
+            "number": int(number) if number.isdigit() else None,
+            "active": active}
+
+
+def parse_rosters(data, filename):
+    """Roster rows from an uploaded CSV or JSON file. Raises ValueError."""
+    text = data.decode("utf-8-sig") if isinstance(data, bytes) else data
+    if filename.lower().endswith(".json"):
+        try:
+            parsed = json.loads(text)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Invalid JSON: {e}") from e
+        if isinstance(parsed, dict):
+            rows = [_row(p, team) for team, players in parsed.items() for p in players]
+        elif isinstance(parsed, list):
+            rows = [_row(p) for p in parsed]
+        else:
+            raise ValueError("JSON rosters must be a list or an object keyed by team")
+    else:
+        reader = csv.DictReader(io.StringIO(text))
+        if not reader.fieldnames or "name" not in [f.strip().lower() for f in reader.fieldnames]:
+            raise ValueError("CSV rosters need a header row with a 'name' column")
+        rows = [_row(r) for r in reader]
+    return [r for r in rows if r is not None]
+
+
+def rosters_csv(rows):
+    out = io.StringIO()
+    writer = csv.DictWriter(out, fieldnames=FIELDS, extrasaction="ignore")
+    writer.writeheader()
+    writer.writerows(rows)
+    return out.getvalue()
+
+
+def rosters_json(rows):
+    return json.dumps([{k: r.get(k) for k in FIELDS} for r in rows], indent=2)
+
+
+def import_rosters(store, rows, default_team_id, prune=False, team_ids=None):
+    """Apply imported rows team by team. Returns {team name: update summary}.
+
+    Rows without a team go to `default_team_id`. Unless `prune`, players
+    missing from the file are left as they are; imported rows replace the
+    matching player in place, new ones are appended to the squad and rows
+    marked inactive take the player out of it. With `team_ids`, a file
+    naming any other team (or a new one) raises ValueError and nothing is
+    imported.
+    """
+    by_team = {}
+    for row in rows:
+        by_team.setdefault(row["team"], []).append(row)
+    names = dict(store.teams())
+    if team_ids is not None:
+        ids = {name: i for i, name in names.items()}
+        denied = sorted(t for t in by_team if t and ids.get(t) not in team_ids)
+        if denied:
+            raise ValueError(f"Not allowed to import into: {', '.join(denied)}")
+    results = {}
+    for team, incoming in by_team.items():
+        team_id = store.ensure_team(team) if team else default_team_id
+        entries = [] if prune else store.squad(team_id)
+        for row in incoming:
+            match = next((i for i, e in enumerate(entries)
+                          if (row["id"] and e.get("id") == row["id"])
+                          or e["name"].lower() == row["name"].lower()), None)
+            if not row["active"]:
+                # Marked inactive in the file: leave them out of the squad
+                if match is not None:
+                    entries.pop(match)
+            elif match is None:
+                entries.append(row)
+            else:
+                entries[match] = {**row, "id": row["id"] or entries[match].get("id")}
+        results[team or names.get(default_team_id, "")] = store.update_squad(team_id, entries)
+    return results
@@ -0,0 +1,331 @@
+import threading
+from datetime import datetime, timezone
+import numpy as np
+import pandas as pd
+import streamlit as st
+from match_formats import FORMATS, get_format
+from match_model import ON_FIELD, LABELS
+from storage import get_store
+from timeline import IntervalIndex, fold_stints
+
+# ---------------------------------------------------------------------
+# Season analytics
+#
+# Finished matches' quarter reports are loaded into long, columnar frames
+# (one row per match × quarter × player × position) and every fairness
+# metric is a vectorized groupby over those columns. A SeasonAnalytics is
+# cached per (team, season); refresh() only reads matches committed since
+# the last call, appends their rows and invalidates the derived tables.
+# Matches whose store revision moved on (restarted, re-finished) have their
+# rows dropped and are read again. Players are keyed by squad id (by name
+# only for ad-hoc match players), so renames and namesakes stay apart;
+# tables show each player's name from their latest match.
+# ---------------------------------------------------------------------
+def season_bounds(season):
+    """[start, end) epoch seconds for a calendar-year season."""
+    start = datetime(int(season), 1, 1, tzinfo=timezone.utc).timestamp()
+    end = datetime(int(season) + 1, 1, 1, tzinfo=timezone.utc).timestamp()
+    return start, end
+
+def current_season():
+    return datetime.now(timezone.utc).year
+
+POSITIONS = tuple(p.label for p in ON_FIELD)
+# Display order of every format's on-field positions, AFL first
+POSITION_ORDER = {label: i for i, label in enumerate(dict.fromkeys(
+    POSITIONS + tuple(label for fmt in FORMATS.values() for label in fmt.labels[1:])))}
+
+def report_players(report, rotations):
+    """(name, {position label: seconds}, rotations) per player of a stored report.
+
+    Reports are saved as {"players": [...], "positions": [...], "time":
+    players × positions} with rotations as a list (reports from before
+    match formats have no "positions" and use the AFL labels); older ones
+    were {name: {label: seconds}} with rotations keyed by name.
+    """
+    if isinstance(report.get("time"), list):
+        labels = report.get("positions") or LABELS
+        rotations = rotations if isinstance(rotations, list) else []
+        for p, (name, row) in enumerate(zip(report["players"], report["time"])):
+            yield name, dict(zip(labels, row)), rotations[p] if p < len(rotations) else 0
+    else:
+        for name, times in report.items():
+            yield name, times, rotations.get(name, 0)
+
+
+def player_key(player_id, name):
+    """Season key of a match player: their squad id, else their name."""
+    return player_id or name
+
+
+def field_positions(times):
+    """On-field position labels of one report row, AFL ones first."""
+    extra = [p for p in times if p not in POSITIONS and p != LABELS[0]]
+    return [p for p in POSITIONS if p in times or not extra] + extra
+
+
+class SeasonAnalytics:
+    def __init__(self, team_id, season):
+        self.team_id = team_id
+        self.season = season
+        self._lock = threading.RLock()
+        self._loaded = {}     # match id -> store revision
+        self._names = {}      # player key -> name in their latest match
+        self._matches = pd.DataFrame({"match": pd.Series(dtype=str),
+                                      "created": pd.Series(dtype=float),
+                                      "format": pd.Series(dtype=object)})
+        self._time = pd.DataFrame({"match": pd.Series(dtype=str), "quarter": pd.Series(dtype=int),
+                                   "player": pd.Series(dtype=str), "position": pd.Series(dtype=str),
+                                   "seconds": pd.Series(dtype=float)})
+        self._durations = pd.DataFrame({"match": pd.Series(dtype=str),
+                                        "quarter": pd.Series(dtype=int),
+                                        "duration": pd.Series(dtype=float)})
+        self._rotations = pd.DataFrame({"match": pd.Series(dtype=str),
+                                        "player": pd.Series(dtype=str),
+                                        "rotations": pd.Series(dtype=int)})
+        self._roster = pd.DataFrame({"match": pd.Series(dtype=str),
+                                     "player": pd.Series(dtype=str)})
+        self._stints = pd.DataFrame({"match": pd.Series(dtype=str), "player": pd.Series(dtype=str),
+                                     "name": pd.Series(dtype=str),
+                                     "position": pd.Series(dtype=str),
+                                     "period": pd.Series(dtype=int),
+                                     "start": pd.Series(dtype=float),
+                                     "end": pd.Series(dtype=float)})
+        self._derived = {}
+
+    # --- loading -----------------------------------------------------
+    def refresh(self):
+        """Fold in matches finished or changed since the last refresh. Returns how many."""
+        with self._lock:
+            start, end = season_bounds(self.season)
+            store = get_store()
+            finished = {m: (c, r, f)
+                        for m, c, r, f in store.finished_revisions(self.team_id, start, end)}
+            stale = [m for m, r in self._loaded.items() if finished.get(m, (0, None))[1] != r]
+            new = [(m, c, f) for m, (c, r, f) in finished.items() if self._loaded.get(m) != r]
+            if not stale and not new:
+                return 0
+            self._drop(stale)
+            if new:
+                reports, rosters = store.report_rows([m for m, _, _ in new])
+                self._append(new, reports, rosters)
+                self._append_stints(store, [m for m, _, _ in new])
+                self._loaded.update((m, finished[m][1]) for m, _, _ in new)
+            self._derived = {}
+            return len(set(stale) | {m for m, _, _ in new})
+
+    def _drop(self, match_ids):
+        """Forget the rows of `match_ids` (matches restarted or saved again)."""
+        if not match_ids:
+            return
+        for name in ("_matches", "_time", "_durations", "_rotations", "_roster", "_stints"):
+            frame = getattr(self, name)
+            setattr(self, name, frame[~frame["match"].isin(match_ids)].reset_index(drop=True))
+        for m in match_ids:
+            del self._loaded[m]
+
+    def _append(self, matches, reports, rosters):
+        by_idx = {(m, i): player_key(pid, name) for m, i, pid, name in rosters}
+        by_name = {}
+        for m, i, pid, name in rosters:
+            by_name.setdefault((m, name), by_idx[(m, i)])
+
+        def keyed(match_id, report, rot):
+            # Reports list players in roster order; legacy ones are keyed by name
+            indexed = isinstance(report.get("time"), list)
+            for p, (name, times, n) in enumerate(report_players(report, rot)):
+                key = by_idx.get((match_id, p)) if indexed else by_name.get((match_id, name))
+                yield key or name, times, n
+
+        cols = {"match": [], "quarter": [], "player": [], "position": [], "seconds": []}
+        for match_id, quarter, _, report, rot in reports:
+            for player, times, _ in keyed(match_id, report, rot):
+                for pos in field_positions(times):
+                    cols["match"].append(match_id)
+                    cols["quarter"].append(quarter)
+                    cols["player"].append(player)
+                    cols["position"].append(pos)
+                    cols["seconds"].append(times.get(pos, 0.0))
+        cum = pd.DataFrame(cols).sort_values(["match", "player", "position", "quarter"])
+        # Reports are cumulative snapshots; difference them into per-quarter time
+        prev = cum.groupby(["match", "player", "position"])["seconds"].shift(fill_value=0.0)
+        cum["seconds"] = (cum["seconds"] - prev).clip(lower=0.0)
+
+        durations = pd.DataFrame([(m, q, d) for m, q, d, _, _ in reports],
+                                 columns=["match", "quarter", "duration"])
+        # Rotation counts are cumulative too; the last quarter holds the match total
+        last_q = durations.groupby("match")["quarter"].max()
+        rotations = pd.DataFrame(
+            [(m, p, n) for m, q, _, report, rot in reports if q == last_q[m]
+             for p, _, n in keyed(m, report, rot)],
+            columns=["match", "player", "rotations"])
+
+        self._matches = pd.concat([self._matches,
+                                   pd.DataFrame(matches, columns=["match", "created", "format"])],
+                                  ignore_index=True)
+        self._time = pd.concat([self._time, cum], ignore_index=True)
+        self._durations = pd.concat([self._durations, durations], ignore_index=True)
+        self._rotations = pd.concat([self._rotations, rotations], ignore_index=True)
+        roster = pd.DataFrame([(m, by_idx[(m, i)]) for m, i, _, _ in rosters],
+                              columns=["match", "player"])
+        self._roster = pd.concat([self._roster, roster], ignore_index=True)
+        created = {m: c for m, c, _ in matches}
+        for m, i, _, name in sorted(rosters, key=lambda r: created.get(r[0], 0)):
+            self._names[by_idx[(m, i)]] = name
+
+    def _append_stints(self, store, match_ids):
+        rows = [(m, player_key(pid, name), name, *rest)
+                for m, pid, name, *rest in store.stint_rows(match_ids)]
+        # Matches finished before stints were recorded: fold them from the log once
+        missing = set(match_ids) - {r[0] for r in rows}
+        for match_id in missing:
+            saved = store.load_match(match_id)
+            if saved is None or not saved["events"]:
+                continue
+            stints, _ = fold_stints(saved["events"], saved["players"])
+            labels = get_format(saved["format"]).labels
+            store.save_stints(match_id, [(p, labels[pos], q, a, b) for p, pos, q, a, b in stints])
+            names, ids = saved["players"], saved["player_ids"]
+            rows += [(match_id, player_key(ids[p], names[p]), names[p], labels[pos], q, a, b)
+                     for p, pos, q, a, b in stints]
+        frame = pd.DataFrame(rows, columns=list(self._stints.columns))
+        self._stints = pd.concat([self._stints, frame], ignore_index=True)
+
+    def _memo(self, name, build):
+        with self._lock:
+            if name not in self._derived:
+                self._derived[name] = build()
+            return self._derived[name]
+
+    # --- metrics -----------------------------------------------------
+    @property
+    def match_count(self):
+        return len(self._loaded)
+
+    def matches(self):
+        """[(match_id, "YYYY-MM-DD HH:MM")] newest first."""
+        frame = self._matches.sort_values("created", ascending=False)
+        return [(m, datetime.fromtimestamp(c, timezone.utc).strftime("%Y-%m-%d %H:%M"))
+                for m, c in zip(frame["match"], frame["created"])]
+
+    def match_format(self, match_id):
+        """The MatchFormat a loaded match was played in."""
+        found = self._matches.loc[self._matches["match"] == match_id, "format"]
+        return get_format(found.iloc[0] if len(found) else None)
+
+    def per_match(self):
+        """Player × match frame: seconds played, match seconds and game-time %."""
+        def build():
+            match_secs = self._durations.groupby("match")["duration"].sum()
+            played = self._time.groupby(["match", "player"])["seconds"].sum()
+            frame = self._roster.set_index(["match", "player"])
+            frame["played"] = played.reindex(frame.index, fill_value=0.0)
+            frame["match_secs"] = match_secs.reindex(frame.index.get_level_values("match")).to_numpy()
+            frame["pct"] = np.where(frame["match_secs"] > 0,
+                                    frame["played"] / frame["match_secs"] * 100, 0.0)
+            order = self._matches.set_index("match")["created"].rank(method="first")
+            frame["order"] = order.reindex(frame.index.get_level_values("match")).to_numpy()
+            return frame.reset_index()
+        return self._memo("per_match", build)
+
+    def positions(self):
+        """Position labels played this season, AFL ones first."""
+        seen = set(self._time["position"])
+        if not seen:
+            return list(POSITIONS)
+        return sorted(seen, key=lambda p: (POSITION_ORDER.get(p, len(POSITION_ORDER)), p))
+
+    def position_distribution(self):
+        """Player × position share of on-ground time (rows sum to 1)."""
+        def build():
+            table = self._time.pivot_table(index="player", columns="position", values="seconds",
+                                           aggfunc="sum", fill_value=0.0)
+            table = table.reindex(columns=self.positions(), fill_value=0.0)
+            totals = table.to_numpy().sum(axis=1, keepdims=True)
+            shares = np.divide(table.to_numpy(), totals, out=np.zeros_like(table.to_numpy()),
+                               where=totals > 0)
+            return pd.DataFrame(shares, index=table.index, columns=table.columns)
+        return self._memo("positions", build)
+
+    def summary(self):
+        """One row per player (indexed by name): games, season game-time %, rotations and trend."""
+        def build():
+            pm = self.per_match()
+            g = pm.groupby("player")
+            out = pd.DataFrame({
+                "Games": g.size(),
+                "Played": g["played"].sum(),
+                "Available": g["match_secs"].sum(),
+            })
+            out["Game %"] = np.where(out["Available"] > 0,
+                                     out["Played"] / out["Available"] * 100, 0.0)
+            rot = self._rotations.groupby("player")["rotations"].sum()
+            out["Rotations"] = rot.reindex(out.index, fill_value=0).astype(int)
+            out["Rotations / game"] = out["Rotations"] / out["Games"]
+            # Least-squares slope of game-time % against match order, per player
+            x, y = pm["order"].to_numpy(), pm["pct"].to_numpy()
+            sums = pd.DataFrame({"player": pm["player"], "x": x, "y": y,
+                                 "xy": x * y, "xx": x * x}).groupby("player").sum()
+            n = out["Games"].reindex(sums.index).to_numpy()
+            denom = n * sums["xx"] - sums["x"] ** 2
+            slope = np.divide(n * sums["xy"] - sums["x"] * sums["y"], denom,
+                              out=np.zeros(len(sums)), where=denom != 0)
+            out["Trend (%/game)"] = pd.Series(slope, index=sums.index).reindex(out.index, fill_value=0.0)
+            shares = self.position_distribution().reindex(out.index, fill_value=0.0)
+            for pos in self.positions():
+                out[f"{pos} share"] = shares[pos] * 100
+            return out.sort_values("Game %", ascending=False).rename(index=self._names)
+        return self._memo("summary", build)
+
+    def stint_summary(self):
+        """One row per player: on-field stints, longest and mean stint, bench time."""
+        def build():
+            frame = self._stints.assign(secs=self._stints["end"] - self._stints["start"])
+            on = frame["position"] != LABELS[0]
+            played = frame[on].groupby("player")["secs"]
+            out = pd.DataFrame({"Stints": played.size(), "Longest stint": played.max(),
+                                "Mean stint": played.mean()})
+            bench = frame[~on].groupby("player")["secs"].sum()
+            players = out.index.union(bench.index)
+            out = out.reindex(players, fill_value=0.0)
+            out["Stints"] = out["Stints"].astype(int)
+            out["Bench time"] = bench.reindex(players, fill_value=0.0)
+            games = self.per_match().groupby("player").size().reindex(players, fill_value=0)
+            out["Bench / game"] = np.where(games > 0, out["Bench time"] / games.clip(lower=1), 0.0)
+            return out.sort_values("Longest stint", ascending=False).rename(index=self._names)
+        return self._memo("stints", build)
+
+    def _stint_index(self):
+        """{(match, period): (IntervalIndex, stint rows)} over the season."""
+        def build():
+            index = {}
+            for key, rows in self._stints.groupby(["match", "period"]):
+                rows = rows.reset_index(drop=True)
+                index[key] = (IntervalIndex(rows["start"], rows["end"]), rows)
+            return index
+        return self._memo("stint_index", build)
+
+    def on_field_at(self, match_id, period, secs):
+        """Players on the field `secs` into `period` of a match, with their positions."""
+        found = self._stint_index().get((match_id, period))
+        if found is None:
+            return pd.DataFrame(columns=["player", "position"])
+        index, rows = found
+        hit = rows.iloc[index.at(secs)]
+        hit = hit[hit["position"] != LABELS[0]]
+        return hit[["name", "position"]].rename(columns={"name": "player"}).reset_index(drop=True)
+
+    def fairness(self):
+        """Spread of season game-time % across the squad."""
+        pct = self.summary()["Game %"].to_numpy()
+        if not len(pct):
+            return {"mean": 0.0, "std": 0.0, "min": 0.0, "max": 0.0, "cv": 0.0}
+        mean, std = float(pct.mean()), float(pct.std())
+        return {"mean": mean, "std": std, "min": float(pct.min()), "max": float(pct.max()),
+                "cv": std / mean if mean else 0.0}
+
+
+@st.cache_resource(ttl=24 * 3600, max_entries=200, show_spinner=False)
+def season_analytics(team_id, season):
+    """Shared, incrementally refreshed analytics for one team's season."""
+    return SeasonAnalytics(team_id, season)
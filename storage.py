@@ -0,0 +1,496 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+import streamlit as st
+
+# ---------------------------------------------------------------------
+# Match persistence
+#
+# Teams own a squad and a series of matches. Squad players have stable ids
+# and are never deleted, only marked inactive, so renames and re-imports
+# keep their history; a name-key index makes club-wide lookups a range
+# scan. Matches are stored as their append-only event log (see
+# match_log.py) plus the match-day roster, the per-quarter reports and
+# the stints (see timeline.py). Users (password hashes only), their teams
+# and their sign-in sessions live here too (see auth.py). Every write is a
+# small insert in its own transaction; with SQLite in WAL mode and
+# synchronous=FULL each commit is one fsync'd append to the write-ahead
+# log, so a crash loses at most the event being written and a
+# reconnecting session reloads the match with one indexed read.
+#
+# Backends are picked by URL from TEAMTRACKER_STORE (default
+# sqlite:///teamtracker.db). Register new ones in BACKENDS.
+# ---------------------------------------------------------------------
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS teams (
+    id       TEXT PRIMARY KEY,
+    name     TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS team_players (
+    team_id  TEXT NOT NULL,
+    idx      INTEGER NOT NULL,
+    name     TEXT NOT NULL,
+    PRIMARY KEY (team_id, idx)
+);
+CREATE TABLE IF NOT EXISTS players (
+    id       TEXT PRIMARY KEY,
+    team_id  TEXT NOT NULL,
+    name     TEXT NOT NULL,
+    name_key TEXT NOT NULL,
+    number   INTEGER,
+    sort     INTEGER NOT NULL DEFAULT 0,
+    active   INTEGER NOT NULL DEFAULT 1
+);
+CREATE INDEX IF NOT EXISTS players_by_team ON players (team_id, active, sort);
+CREATE INDEX IF NOT EXISTS players_by_name ON players (name_key);
+CREATE TABLE IF NOT EXISTS matches (
+    id       TEXT PRIMARY KEY,
+    created  REAL NOT NULL,
+    status   TEXT NOT NULL DEFAULT 'live',
+    team_id  TEXT
+);
+CREATE TABLE IF NOT EXISTS match_players (
+    match_id TEXT NOT NULL,
+    idx      INTEGER NOT NULL,
+    name     TEXT NOT NULL,
+    PRIMARY KEY (match_id, idx)
+);
+CREATE TABLE IF NOT EXISTS events (
+    match_id TEXT NOT NULL,
+    seq      INTEGER NOT NULL,
+    t        REAL NOT NULL,
+    kind     TEXT NOT NULL,
+    data     TEXT NOT NULL,
+    PRIMARY KEY (match_id, seq)
+);
+CREATE TABLE IF NOT EXISTS quarter_reports (
+    match_id  TEXT NOT NULL,
+    quarter   INTEGER NOT NULL,
+    duration  REAL NOT NULL,
+    report    TEXT NOT NULL,
+    rotations TEXT NOT NULL DEFAULT '{}',
+    PRIMARY KEY (match_id, quarter)
+);
+CREATE TABLE IF NOT EXISTS stints (
+    match_id TEXT NOT NULL,
+    player   INTEGER NOT NULL,
+    position TEXT NOT NULL,
+    period   INTEGER NOT NULL,
+    start    REAL NOT NULL,
+    end      REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS stints_by_match ON stints (match_id, period, start);
+CREATE TABLE IF NOT EXISTS users (
+    username TEXT PRIMARY KEY,
+    password TEXT NOT NULL,
+    is_admin INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS user_teams (
+    username TEXT NOT NULL,
+    team_id  TEXT NOT NULL,
+    PRIMARY KEY (username, team_id)
+);
+CREATE TABLE IF NOT EXISTS sessions (
+    key      TEXT PRIMARY KEY,
+    username TEXT NOT NULL,
+    expires  REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS settings (
+    key      TEXT PRIMARY KEY,
+    value    TEXT NOT NULL
+);
+"""
+
+
+class SQLiteMatchStore:
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=FULL")
+        self._conn.executescript(_SCHEMA)
+        self._migrate()
+
+    def _migrate(self):
+        cols = {row[1] for row in self._conn.execute("PRAGMA table_info(matches)")}
+        if "team_id" not in cols:
+            self._conn.execute("ALTER TABLE matches ADD COLUMN team_id TEXT")
+        cols = {row[1] for row in self._conn.execute("PRAGMA table_info(quarter_reports)")}
+        if "rotations" not in cols:
+            self._conn.execute(
+                "ALTER TABLE quarter_reports ADD COLUMN rotations TEXT NOT NULL DEFAULT '{}'")
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS matches_by_team ON matches (team_id, created)")
+        cols = {row[1] for row in self._conn.execute("PRAGMA table_info(matches)")}
+        if "format" not in cols:
+            self._conn.execute("ALTER TABLE matches ADD COLUMN format TEXT")
+        if "revision" not in cols:
+            self._conn.execute("ALTER TABLE matches ADD COLUMN revision INTEGER NOT NULL DEFAULT 0")
+        cols = {row[1] for row in self._conn.execute("PRAGMA table_info(teams)")}
+        if "format" not in cols:
+            self._conn.execute("ALTER TABLE teams ADD COLUMN format TEXT")
+        cols = {row[1] for row in self._conn.execute("PRAGMA table_info(match_players)")}
+        if "player_id" not in cols:
+            self._conn.execute("ALTER TABLE match_players ADD COLUMN player_id TEXT")
+        # Rosters used to be plain name lists in team_players
+        self._conn.execute(
+            "INSERT INTO players (id, team_id, name, name_key, sort) "
+            "SELECT lower(hex(randomblob(16))), team_id, name, lower(name), idx FROM team_players "
+            "WHERE team_id NOT IN (SELECT DISTINCT team_id FROM players)")
+
+    def _write(self, sql, rows=None, many=False):
+        self._write_all([(sql, rows, many)])
+
+    def _write_all(self, statements):
+        """Run (sql, args, many) statements in one transaction."""
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                for sql, rows, many in statements:
+                    if many:
+                        self._conn.executemany(sql, rows)
+                    else:
+                        self._conn.execute(sql, rows or ())
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def _read(self, sql, args=()):
+        with self._lock:
+            return self._conn.execute(sql, args).fetchall()
+
+    # --- teams -------------------------------------------------------
+    def ensure_team(self, name):
+        """Id of the team called `name`, creating it if needed."""
+        found = self._read("SELECT id FROM teams WHERE name = ?", (name,))
+        if found:
+            return found[0][0]
+        team_id = uuid.uuid4().hex
+        self._write("INSERT OR IGNORE INTO teams (id, name) VALUES (?, ?)", (team_id, name))
+        return self._read("SELECT id FROM teams WHERE name = ?", (name,))[0][0]
+
+    def team_format(self, team_id):
+        """Key of the team's match format (None for the default)."""
+        found = self._read("SELECT format FROM teams WHERE id = ?", (team_id,))
+        return found[0][0] if found else None
+
+    def set_team_format(self, team_id, format_key):
+        self._write("UPDATE teams SET format = ? WHERE id = ?", (format_key, team_id))
+
+    def teams(self):
+        """[(team_id, name)] for every team, by name."""
+        return self._read("SELECT id, name FROM teams ORDER BY name")
+
+    # --- users and sessions ------------------------------------------
+    def user(self, username):
+        """(password hash, is_admin) for a user, or None."""
+        found = self._read("SELECT password, is_admin FROM users WHERE username = ?", (username,))
+        return (found[0][0], bool(found[0][1])) if found else None
+
+    def users(self):
+        """[(username, is_admin)] for every user, by name."""
+        return [(u, bool(a)) for u, a in
+                self._read("SELECT username, is_admin FROM users ORDER BY username")]
+
+    def save_user(self, username, password, is_admin=False, team_ids=None):
+        """Create or update a user; `team_ids` (if given) replaces their teams."""
+        statements = [("INSERT INTO users (username, password, is_admin) VALUES (?, ?, ?) "
+                       "ON CONFLICT (username) DO UPDATE SET password = excluded.password, "
+                       "is_admin = excluded.is_admin", (username, password, int(is_admin)), False)]
+        if team_ids is not None:
+            statements += [
+                ("DELETE FROM user_teams WHERE username = ?", (username,), False),
+                ("INSERT INTO user_teams (username, team_id) VALUES (?, ?)",
+                 [(username, t) for t in team_ids], True),
+            ]
+        self._write_all(statements)
+
+    def user_teams(self, username):
+        """Ids of the teams a user may see."""
+        return [t for (t,) in self._read(
+            "SELECT team_id FROM user_teams WHERE username = ?", (username,))]
+
+    def save_session(self, key, username, expires):
+        self._write_all([
+            ("DELETE FROM sessions WHERE expires < ?", (time.time(),), False),
+            ("INSERT INTO sessions (key, username, expires) VALUES (?, ?, ?)",
+             (key, username, expires), False),
+        ])
+
+    def load_session(self, key):
+        """(username, expires) of a stored session, or None."""
+        found = self._read("SELECT username, expires FROM sessions WHERE key = ?", (key,))
+        return found[0] if found else None
+
+    def delete_sessions(self, key=None, username=None):
+        """Delete one session by key, or all of a user's."""
+        if key is not None:
+            self._write("DELETE FROM sessions WHERE key = ?", (key,))
+        else:
+            self._write("DELETE FROM sessions WHERE username = ?", (username,))
+
+    def setting(self, key):
+        found = self._read("SELECT value FROM settings WHERE key = ?", (key,))
+        return found[0][0] if found else None
+
+    def set_setting(self, key, value):
+        """Set `key` unless it is already set; returns the stored value."""
+        self._write("INSERT OR IGNORE INTO settings (key, value) VALUES (?, ?)", (key, value))
+        return self.setting(key)
+
+    # --- squads ------------------------------------------------------
+    def squad(self, team_id, include_inactive=False):
+        """A team's players in squad order, as dicts with id, name, number, active and sort."""
+        rows = self._read(
+            "SELECT id, name, number, active, sort FROM players WHERE team_id = ? "
+            + ("" if include_inactive else "AND active = 1 ") + "ORDER BY sort, rowid", (team_id,))
+        return [{"id": i, "name": n, "number": num, "active": bool(a), "sort": k}
+                for i, n, num, a, k in rows]
+
+    def update_squad(self, team_id, players, prune=True):
+        """Bring a team's squad in line with `players`, touching only what changed.
+
+        Each entry is a dict with a name and optionally an id and number.
+        Entries are matched to existing players by id, then by name
+        (case-insensitive); unmatched ones are added. With `prune`, active
+        players missing from `players` are marked inactive. Returns
+        {"added": [ids], "renamed": {id: name}, "removed": [ids]}.
+        """
+        existing = {p["id"]: p for p in self.squad(team_id, include_inactive=True)}
+        by_name = {}
+        for p in existing.values():
+            by_name.setdefault(p["name"].lower(), []).append(p["id"])
+        seen, inserts, updates = set(), [], []
+        added, renamed = [], {}
+        for sort, entry in enumerate(players):
+            name = str(entry["name"]).strip()
+            if not name:
+                continue
+            number = entry.get("number")
+            number = int(number) if number not in (None, "") else None
+            pid = entry.get("id") if entry.get("id") in existing else None
+            if pid is None:
+                pid = next((i for i in by_name.get(name.lower(), []) if i not in seen), None)
+            if pid is None or pid in seen:
+                pid = uuid.uuid4().hex
+                inserts.append((pid, team_id, name, name.lower(), number, sort))
+                added.append(pid)
+            else:
+                old = existing[pid]
+                if old["name"] != name:
+                    renamed[pid] = name
+                if (old["name"], old["number"], old["sort"], old["active"]) != (name, number, sort, True):
+                    updates.append((name, name.lower(), number, sort, pid))
+            seen.add(pid)
+        removed = [i for i, p in existing.items() if p["active"] and i not in seen] if prune else []
+        self._write_all([
+            ("INSERT INTO players (id, team_id, name, name_key, number, sort) "
+             "VALUES (?, ?, ?, ?, ?, ?)", inserts, True),
+            ("UPDATE players SET name = ?, name_key = ?, number = ?, sort = ?, active = 1 "
+             "WHERE id = ?", updates, True),
+            ("UPDATE players SET active = 0 WHERE id = ?", [(i,) for i in removed], True),
+        ])
+        return {"added": added, "renamed": renamed, "removed": removed}
+
+    def find_players(self, text, limit=20, team_ids=None):
+        """Active players of the given teams (default: the whole club) whose
+        name starts with `text`.
+
+        Returns [(player_id, name, team name)]; an indexed range scan.
+        """
+        key = text.strip().lower()
+        if not key or (team_ids is not None and not team_ids):
+            return []
+        where, args = "", ()
+        if team_ids is not None:
+            where = f" AND p.team_id IN ({', '.join('?' * len(team_ids))})"
+            args = tuple(team_ids)
+        return self._read(
+            "SELECT p.id, p.name, t.name FROM players p JOIN teams t ON t.id = p.team_id "
+            "WHERE p.name_key >= ? AND p.name_key < ? AND p.active = 1" + where +
+            " ORDER BY p.name_key LIMIT ?", (key, key + "\uffff", *args, limit))
+
+    def export_squads(self, team_ids=None):
+        """Every player of the given teams (default: all) as flat dicts."""
+        teams = [(i, n) for i, n in self.teams() if team_ids is None or i in team_ids]
+        return [{"team": name, "id": p["id"], "name": p["name"], "number": p["number"],
+                 "active": p["active"]}
+                for team_id, name in teams for p in self.squad(team_id, include_inactive=True)]
+
+    # --- matches -----------------------------------------------------
+    def create_match(self, players, team_id=None, player_ids=None, format_key=None):
+        match_id = uuid.uuid4().hex
+        player_ids = player_ids or [None] * len(players)
+        self._write_all([
+            ("INSERT INTO matches (id, created, team_id, format) VALUES (?, ?, ?, ?)",
+             (match_id, time.time(), team_id, format_key), False),
+            ("INSERT INTO match_players (match_id, idx, name, player_id) VALUES (?, ?, ?, ?)",
+             [(match_id, i, n, pid) for i, (n, pid) in enumerate(zip(players, player_ids))], True),
+        ])
+        return match_id
+
+    def match_team(self, match_id):
+        found = self._read("SELECT team_id FROM matches WHERE id = ?", (match_id,))
+        return found[0][0] if found else None
+
+    def finished_matches(self, team_id, start, end):
+        """[(match_id, created)] for a team's finished matches created in [start, end).
+
+        With team_id None, every team's matches in that window.
+        """
+        if team_id is None:
+            return self._read("SELECT id, created FROM matches WHERE status = 'finished' "
+                              "AND created >= ? AND created < ? ORDER BY created", (start, end))
+        return self._read("SELECT id, created FROM matches WHERE team_id = ? AND status = 'finished' "
+                          "AND created >= ? AND created < ? ORDER BY created",
+                          (team_id, start, end))
+
+    def finished_revisions(self, team_id, start, end):
+        """[(match_id, created, revision, format)] for a team's finished matches created in [start, end)."""
+        return self._read("SELECT id, created, revision, format FROM matches WHERE team_id = ? "
+                          "AND status = 'finished' AND created >= ? AND created < ? ORDER BY created",
+                          (team_id, start, end))
+
+    def latest_match(self, team_id):
+        """Most recently created match for a team, or None."""
+        found = self._read("SELECT id FROM matches WHERE team_id = ? "
+                           "ORDER BY created DESC LIMIT 1", (team_id,))
+        return found[0][0] if found else None
+
+    def load_match(self, match_id):
+        """Roster and event log for a match, or None if it does not exist."""
+        found = self._read("SELECT status, format FROM matches WHERE id = ?", (match_id,))
+        if not found:
+            return None
+        roster = self._read(
+            "SELECT name, player_id FROM match_players WHERE match_id = ? ORDER BY idx", (match_id,))
+        events = [{"t": t, "kind": kind, **json.loads(data)} for t, kind, data in self._read(
+            "SELECT t, kind, data FROM events WHERE match_id = ? ORDER BY seq", (match_id,))]
+        return {"id": match_id, "status": found[0][0], "format": found[0][1],
+                "players": [n for n, _ in roster], "player_ids": [i for _, i in roster],
+                "events": events}
+
+    def rename_player(self, match_id, idx, name):
+        self._write("UPDATE match_players SET name = ? WHERE match_id = ? AND idx = ?",
+                    (name, match_id, idx))
+
+    def set_status(self, match_id, status):
+        """Set a match's status; bumps its revision, as reports are saved alongside."""
+        self._write("UPDATE matches SET status = ?, revision = revision + 1 WHERE id = ?",
+                    (status, match_id))
+
+    # --- events ------------------------------------------------------
+    @staticmethod
+    def _event_rows(match_id, first_seq, events):
+        rows = []
+        for seq, e in enumerate(events, first_seq):
+            data = {k: v for k, v in e.items() if k not in ("t", "kind")}
+            rows.append((match_id, seq, e["t"], e["kind"], json.dumps(data)))
+        return rows
+
+    def append_events(self, match_id, first_seq, events):
+        self._write("INSERT INTO events (match_id, seq, t, kind, data) VALUES (?, ?, ?, ?, ?)",
+                    self._event_rows(match_id, first_seq, events), many=True)
+
+    def truncate_events(self, match_id, seq):
+        self._write("DELETE FROM events WHERE match_id = ? AND seq >= ?", (match_id, seq))
+
+    def replace_events(self, match_id, first_seq, events):
+        """Rewrite the log from `first_seq` on in one transaction."""
+        self._write_all([
+            ("DELETE FROM events WHERE match_id = ? AND seq >= ?", (match_id, first_seq), False),
+            ("INSERT INTO events (match_id, seq, t, kind, data) VALUES (?, ?, ?, ?, ?)",
+             self._event_rows(match_id, first_seq, events), True),
+        ])
+
+    # --- quarter reports ---------------------------------------------
+    def save_quarter_report(self, match_id, quarter, duration, report, rotations=None):
+        self._write("INSERT OR REPLACE INTO quarter_reports "
+                    "(match_id, quarter, duration, report, rotations) VALUES (?, ?, ?, ?, ?)",
+                    (match_id, quarter, duration, json.dumps(report), json.dumps(rotations or {})))
+
+    def delete_quarter_reports(self, match_id, from_quarter=1):
+        self._write_all([
+            ("DELETE FROM quarter_reports WHERE match_id = ? AND quarter >= ?",
+             (match_id, from_quarter), False),
+            ("DELETE FROM stints WHERE match_id = ? AND period >= ?", (match_id, from_quarter), False),
+        ])
+
+    def save_stints(self, match_id, stints):
+        """Replace a match's stints with (player, position, period, start, end) rows."""
+        self._write_all([
+            ("DELETE FROM stints WHERE match_id = ?", (match_id,), False),
+            ("INSERT INTO stints (match_id, player, position, period, start, end) "
+             "VALUES (?, ?, ?, ?, ?, ?)", [(match_id, *s) for s in stints], True),
+        ])
+
+    def stint_rows(self, match_ids):
+        """Bulk read of stints as (match_id, player id, name, position, period, start, end).
+
+        The player id is the squad id (None for ad-hoc match players).
+        """
+        rows, ids = [], list(match_ids)
+        for i in range(0, len(ids), 500):
+            chunk = ids[i:i + 500]
+            marks = ",".join("?" * len(chunk))
+            rows += self._read(
+                f"SELECT s.match_id, mp.player_id, mp.name, s.position, s.period, s.start, s.end FROM stints s "
+                f"JOIN match_players mp ON mp.match_id = s.match_id AND mp.idx = s.player "
+                f"WHERE s.match_id IN ({marks}) ORDER BY s.match_id, s.period, s.start", chunk)
+        return rows
+
+    def quarter_reports(self, match_id):
+        """{quarter: (duration, {"players": [...], "time": players × Position seconds})}"""
+        return {q: (d, json.loads(r)) for q, d, r in self._read(
+            "SELECT quarter, duration, report FROM quarter_reports WHERE match_id = ? "
+            "ORDER BY quarter", (match_id,))}
+
+    def report_rows(self, match_ids):
+        """Bulk read of quarter reports and rosters for many matches.
+
+        Returns (reports, rosters): reports are (match_id, quarter, duration,
+        report, rotations) with the JSON columns decoded, rosters are
+        (match_id, idx, player id, name) with None ids for ad-hoc players.
+        """
+        reports, rosters = [], []
+        ids = list(match_ids)
+        for i in range(0, len(ids), 500):
+            chunk = ids[i:i + 500]
+            marks = ",".join("?" * len(chunk))
+            reports += [(m, q, d, json.loads(r), json.loads(rot)) for m, q, d, r, rot in self._read(
+                f"SELECT match_id, quarter, duration, report, rotations FROM quarter_reports "
+                f"WHERE match_id IN ({marks})", chunk)]
+            rosters += self._read(
+                f"SELECT match_id, idx, player_id, name FROM match_players "
+                f"WHERE match_id IN ({marks}) ORDER BY match_id, idx", chunk)
+        return reports, rosters
+
+
+def _open_sqlite(location):
+    # sqlite:///relative.db, sqlite:////absolute/path.db
+    path = location[1:] if location.startswith("/") else location
+    return SQLiteMatchStore(path or "teamtracker.db")
+
+BACKENDS = {
+    "sqlite": _open_sqlite,
+}
+
+def store_url(url=None):
+    return url or os.environ.get("TEAMTRACKER_STORE", "sqlite:///teamtracker.db")
+
+def open_store(url=None):
+    """A new store for `url`; use get_store() inside the app."""
+    scheme, _, location = store_url(url).partition("://")
+    if scheme not in BACKENDS:
+        raise ValueError(f"Unknown storage backend: {scheme}")
+    return BACKENDS[scheme](location)
+
+@st.cache_resource
+def get_store(url=None):
+    """One store per process, shared by every session."""
+    return open_store(url)
@@ -1,6 +1,30 @@
+import html
 import streamlit as st
 import time
+import pandas as pd
 from streamlit_autorefresh import st_autorefresh
+from match_log import POSITION, QUARTER_START, QUARTER_END, RESTART
+from live_clock import render_live_clock
+from report_pdf import build_report_pdf, report_digest
+from storage import get_store, store_url
+from club import live_match, new_match, find_match, team_squad, update_squad, rosters_changed
+from report_export import FORMATS, export, spool, match_rows, season_rows, round_matches, pdf_zip_stream
+from metrics import Laps, timed, rerun, tick, registry, state_size, metrics_url
+from roster_io import parse_rosters, import_rosters, rosters_csv, rosters_json
+from assets import image_url, stylesheet
+from season_analytics import season_analytics, current_season
+from match_view import MatchView
+from match_model import Position
+from match_formats import FORMATS as MATCH_FORMATS, get_format
+from rotation_planner import suggest_substitutions, plan_quarter
+from offline_sync import offline_pad, sync_offline
+from broadcast import HEARTBEAT_SECS, match_channel, session_id, share_link, spectator_view
+from auth import MIN_PASSWORD, allowed_team, visible_teams, save_user, sign_out, write_cookie
+from timeline import Timeline, gantt_chart, render_replay
+
+# Team used when the app is run directly without logging in
+DEFAULT_TEAM = "Default"
+LOGO_PATH = "images/Gemba.png"
 
 # ---------------------------------------------------------------------
 # Sidebar customization (called inside main_app)
@@ -8,7 +32,8 @@ from streamlit_autorefresh import st_autorefresh
 def customize_sidebar():
     with st.sidebar:
         # Logo
-        st.image("images/Gemba.png", use_container_width=True)
+        st.markdown(f"<img class='sidebar-logo' src='{image_url(LOGO_PATH)}' alt='Gemba'>",
+                    unsafe_allow_html=True)
         # Title
         st.markdown("<div class='sidebar-title'>TIME TRACKER PRO</div>", unsafe_allow_html=True)
         # Navigation buttons
@@ -16,6 +41,21 @@ def customize_sidebar():
             st.session_state.page = "Settings"
         if st.button("Match", key="nav_match"):
             st.session_state.page = "Match"
+        if st.button("Season", key="nav_season"):
+            st.session_state.page = "Season"
+        if st.session_state.get("is_admin") and st.button("Admin", key="nav_admin"):
+            st.session_state.page = "Admin"
+        # Team picker for users with more than one team
+        teams = st.session_state.get("teams") or ()
+        if len(teams) > 1:
+            names = dict(get_store().teams())
+            st.selectbox("Team", teams, index=teams.index(st.session_state.team_id),
+                         format_func=lambda t: names.get(t, t), key="team_pick",
+                         on_change=switch_team)
+        if st.session_state.get("session_token") and st.button("Sign out", key="nav_sign_out"):
+            leave_match()
+            sign_out()
+            st.rerun()
         # Footer
         st.markdown("<div class='powered-by'>Powered by Gemba</div>", unsafe_allow_html=True)
 
@@ -26,71 +66,353 @@ def format_elapsed_time(seconds):
     m, s = divmod(int(seconds), 60)
     return f"{m:02d}:{s:02d}"
 
-def get_color(position):
-    if position == "Forward":   return ("green","white")
-    if position == "Midfield":  return ("blue","white")
-    if position == "Defence":   return ("purple","white")
-    if position == "Off":       return ("black","white")
+def parse_elapsed_time(text):
+    """Seconds from "mm:ss" (or plain minutes), None if it doesn't parse."""
+    try:
+        m, _, s = text.strip().partition(":")
+        return int(m) * 60 + (int(s) if s else 0)
+    except ValueError:
+        return None
+
+def get_color(match_format, position):
+    if 0 <= position < match_format.n_positions:
+        return match_format.colors[position]
     return ("lightgrey","black")
 
-def accumulate_time():
-    now = time.time()
-    delta = now - st.session_state.last_update_time
-    for p, pos in st.session_state.current_positions.items():
-        if pos != "Off":
-            st.session_state.position_time[p][pos] += delta
-    st.session_state.last_update_time = now
+def current_match():
+    """Shared MatchLog for this session's match."""
+    return live_match(st.session_state.match_id)
+
+# Buttons on the match page that write to the log
+WRITE_BUTTONS = ("start_btn", "end_btn", "restart_btn", "restart_qtr_btn")
+
+def is_writer():
+    """Hold (and refresh) this session's writer lease on its match.
+
+    Every write path checks it: callbacks and fragment reruns do not pass
+    through show_match(), where the lease is otherwise renewed.
+    """
+    return match_channel(st.session_state.match_id).claim(session_id())
+
+def refuse_write():
+    """Drop a write from a session that lost the match; show_match() says so."""
+    st.session_state.write_refused = True
+
+@st.fragment(run_every=HEARTBEAT_SECS)
+def writer_heartbeat():
+    """Renew the writer lease while the page is open, reruns or not."""
+    if not is_writer():
+        st.rerun(scope="app")
 
 def commit_position_change(player):
-    now = time.time()
-    if st.session_state.quarter_running:
-        accumulate_time()
-    old_pos = st.session_state.current_positions.get(player, "Off")
-    mapping = {"FWD":"Forward","MID":"Midfield","DEF":"Defence","Off":"Off"}
-    new_val = st.session_state.get(f"radio_{player}", "Off")
-    new_pos = mapping[new_val]
-    # Only count Off → On as a rotation
-    if st.session_state.quarter_running and old_pos == "Off" and new_pos != "Off":
-        st.session_state.rotations[player] = st.session_state.rotations.get(player, 0) + 1
-    st.session_state.current_positions[player] = new_pos
-    st.session_state.last_update_time = now
+    if not is_writer():
+        refuse_write()
+        return
+    log = current_match()
+    old_pos = log.state().position[player]
+    new_pos = log.format.by_short[st.session_state.get(f"radio_{player}", "Off")]
+    if new_pos != old_pos:
+        log.append(POSITION, player=player, position=int(new_pos))
     st.session_state.alert_msg = ""
 
+def open_match(players=None):
+    """Resume the team's match (the one in the URL if given), or start a new one for `players`."""
+    team_id = st.session_state.team_id
+    match_id = None
+    if players is None:
+        match_id = find_match(team_id, st.query_params.get("match"))
+    if match_id is None:
+        match_id = new_match(team_id, players)
+    if st.session_state.get("match_id") not in (None, match_id):
+        match_channel(st.session_state.match_id).release(session_id())
+    st.session_state.match_id = match_id
+    st.query_params["match"] = match_id
+
+def leave_match():
+    """Drop this session's match (and its writer lease)."""
+    match_id = st.session_state.pop("match_id", None)
+    if match_id is not None:
+        match_channel(match_id).release(session_id())
+    for key in ("match_view", "match_snap"):
+        st.session_state.pop(key, None)
+
+def switch_team():
+    team_id = st.session_state.team_pick
+    if allowed_team(team_id) and team_id != st.session_state.team_id:
+        leave_match()
+        st.session_state.team_id = team_id
+        st.query_params.pop("match", None)
+
+def match_view():
+    """This session's derived view of its match."""
+    log = current_match()
+    view = st.session_state.get("match_view")
+    if view is None or view.log is not log:
+        view = st.session_state.match_view = MatchView(log)
+    return view
+
+def apply_moves(moves):
+    if not is_writer():
+        refuse_write()
+        return
+    log = current_match()
+    for p, _, to in moves:
+        log.append(POSITION, player=p, position=int(to))
+    reset_position_widgets([p for p, _, _ in moves])
+    st.session_state.alert_msg = ""
+
+def rotation_plan(snap):
+    """Suggested moves and period schedule, re-solved only when the match changes."""
+    key = (st.session_state.match_id, snap["revision"], int(snap["now"] // 15))
+    cached = st.session_state.get("rotation_plan")
+    if cached and cached[0] == key:
+        return cached[1]
+    fmt = snap["format"]
+    period_secs = fmt.period_secs
+    if fmt.rolling:
+        interval = fmt.interchange_secs
+        remaining = period_secs - snap["quarter_secs"]
+        horizon = min(interval, remaining) if remaining > 0 else interval
+    else:
+        # Changes only at breaks: plan the whole next period in one go
+        interval = horizon = period_secs
+    moves = suggest_substitutions(snap["times"], snap["positions"], horizon, snap["match_secs"],
+                                  max_changes=fmt.max_changes)
+    schedule = plan_quarter(snap["times"], snap["positions"], period_secs,
+                            snap["quarter_secs"], snap["match_secs"], interval,
+                            max_changes=fmt.max_changes) if fmt.rolling else []
+    st.session_state.rotation_plan = (key, (moves, schedule))
+    return moves, schedule
+
+def save_quarter_reports(log):
+    """Write every ended quarter's report and the match status to the store."""
+    state = log.state()
+    for q, report in state.reports.items():
+        log.store.save_quarter_report(log.match_id, q, state.durations[q],
+                                      {"players": list(log.players),
+                                       "positions": list(log.format.labels),
+                                       "time": report.tolist()},
+                                      state.rotations.tolist())
+    log.store.save_stints(log.match_id, Timeline.from_log(log).rows())
+    log.store.set_status(log.match_id, "finished" if state.finished else "live")
+
+def reset_position_widgets(players):
+    # Radios keep their own value; drop them so they re-seed from the log
+    for p in players:
+        st.session_state.pop(f"radio_{p}", None)
+
 # ---------------------------------------------------------------------
 # Settings Page
 # ---------------------------------------------------------------------
+def apply_renames(log, renamed):
+    """Carry squad renames ({player id: name}) into the open match."""
+    for p, pid in enumerate(log.player_ids):
+        if pid in renamed and log.players[p] != renamed[pid]:
+            log.rename_player(p, renamed[pid])
+            log.store.rename_player(log.match_id, p, renamed[pid])
+
+def show_squad(log):
+    team_id = st.session_state.team_id
+    st.subheader("Squad")
+    squad = team_squad(team_id)
+    # A team without a saved squad starts from the current match's names
+    rows = squad or [{"id": None, "name": n, "number": None} for n in log.players]
+    frame = pd.DataFrame({"id": [p["id"] for p in rows],
+                          "Name": [p["name"] for p in rows],
+                          "Number": pd.array([p["number"] for p in rows], dtype="Int64")})
+    edited = st.data_editor(frame, num_rows="dynamic", hide_index=True, key="squad_editor",
+                            column_config={"id": None})
+    if st.button("Save Squad"):
+        entries = [{"id": r["id"] if isinstance(r["id"], str) else None,
+                    "name": r["Name"] if isinstance(r["Name"], str) else "",
+                    "number": None if pd.isna(r["Number"]) else int(r["Number"])}
+                   for r in edited.to_dict("records")]
+        changes = update_squad(team_id, entries)
+        apply_renames(log, changes["renamed"])
+        # The editor's pending edits now refer to the old table; start it afresh
+        st.session_state.pop("squad_editor", None)
+        st.session_state.squad_msg = (f"Squad saved: {len(changes['added'])} added, "
+                                      f"{len(changes['renamed'])} renamed, "
+                                      f"{len(changes['removed'])} removed.")
+        st.rerun()
+    if st.session_state.get("squad_msg"):
+        st.success(st.session_state.pop("squad_msg"))
+
+    st.subheader("Match Day")
+    by_id = {p["id"]: p for p in squad}
+    current = [pid for pid in log.player_ids if pid in by_id]
+    selected = st.multiselect("Players for the next match", list(by_id),
+                              default=current or list(by_id),
+                              format_func=lambda pid: by_id[pid]["name"])
+    if st.button("Start New Match", help="Starts a fresh match with the selected players."):
+        if selected:
+            reset_position_widgets(range(len(log.players)))
+            open_match([by_id[pid] for pid in selected])
+            st.session_state.alert_msg = ""
+            st.success("New match ready.")
+        else:
+            st.warning("Select at least one player.")
+
+    search = st.text_input("Find a player in the club")
+    if search:
+        found = get_store().find_players(search, team_ids=visible_teams())
+        st.table([{"Player": name, "Team": team} for _, name, team in found]
+                 if found else [{"Player": "No matches", "Team": ""}])
+
+    with st.expander("Import / export rosters"):
+        upload = st.file_uploader("Roster file (CSV or JSON)", type=["csv", "json"])
+        prune = st.checkbox("Replace squads with the file",
+                            help="Players of the imported teams who are not in the file become inactive.")
+        if upload is not None and st.button("Import"):
+            try:
+                rows = parse_rosters(upload.getvalue(), upload.name)
+                results = import_rosters(get_store(), rows, team_id, prune, visible_teams())
+            except ValueError as e:
+                st.error(str(e))
+            else:
+                rosters_changed()
+                for changes in results.values():
+                    apply_renames(log, changes["renamed"])
+                st.success("Imported " + "; ".join(
+                    f"{team}: {len(c['added'])} added, {len(c['renamed'])} renamed, "
+                    f"{len(c['removed'])} removed" for team, c in results.items()))
+        rows = get_store().export_squads(visible_teams())
+        c1, c2 = st.columns(2)
+        c1.download_button("Export CSV", rosters_csv(rows), file_name="rosters.csv",
+                           mime="text/csv", key="export_csv")
+        c2.download_button("Export JSON", rosters_json(rows), file_name="rosters.json",
+                           mime="application/json", key="export_json")
+
 def show_settings():
     st.header("Settings")
-    st.write("Enter up to 25 players (one per line).")
-    existing = "\n".join(st.session_state.players)
-    player_input = st.text_area("Player Names", value=existing, height=200)
+    log = current_match()
+    show_squad(log)
+
+    st.subheader("Match")
+    team_format = get_format(get_store().team_format(st.session_state.team_id))
+    format_key = st.selectbox(
+        "Match format", list(MATCH_FORMATS), index=list(MATCH_FORMATS).index(team_format.key),
+        format_func=lambda k: MATCH_FORMATS[k].name,
+        help="Periods, positions and interchange rules. Applies from the next new match."
+    )
+    client_clock = st.checkbox(
+        "Client-side match clock",
+        value=st.session_state.client_clock,
+        help="Tick the timer in the browser and only rerun on match events. "
+             "Turn off to fall back to a full refresh every second."
+    )
+    offline_mode = st.checkbox(
+        "Offline sideline mode",
+        value=st.session_state.offline_mode,
+        help="Record changes on this device and sync them when the connection "
+             "allows, instead of a server round-trip per tap."
+    )
     if st.button("Save Settings"):
-        names = [n.strip() for n in player_input.split("\n") if n.strip()][:25]
-        st.session_state.players = names
-        st.session_state.position_time = {n:{"Forward":0,"Midfield":0,"Defence":0} for n in names}
-        st.session_state.current_positions = {n:"Off" for n in names}
-        st.session_state.rotations = {n:0 for n in names}
-        st.session_state.quarter_reports = {}
-        st.session_state.quarter_durations = {}
+        st.session_state.client_clock = client_clock
+        st.session_state.offline_mode = offline_mode
+        get_store().set_team_format(st.session_state.team_id, format_key)
         st.session_state.alert_msg = ""
         st.success("Settings saved!")
-    st.write("Current players:")
-    for i, n in enumerate(st.session_state.players, 1):
+    st.write("Current match players:")
+    for i, n in enumerate(current_match().players, 1):
         st.write(f"{i}. {n}")
 
+@st.fragment
+@timed("player_columns")
+def player_columns():
+    if not is_writer():
+        # Taken over elsewhere: the full page shows the spectator view
+        st.rerun(scope="app")
+    log = current_match()
+    snap = st.session_state.match_snap
+    if snap["revision"] != log.revision:
+        # Fragment-only rerun after a position change: refresh just the columns
+        snap = match_view().compute(time.time())
+    names = snap["names"]
+    fmt = snap["format"]
+    running = log.state().running
+    if running and st.session_state.client_clock:
+        render_live_clock(snap["now"], snap["quarter_secs"], snap["match_secs"],
+                          zip(snap["totals"], snap["positions"] != Position.OFF))
+
+    if not log.state().finished:
+        moves, schedule = rotation_plan(snap)
+        with st.expander("Suggested rotation"):
+            if not moves:
+                st.write("No changes suggested.")
+            else:
+                for p, frm, to in moves:
+                    st.write(f"{names[p]}: {fmt.shorts[frm]} → {fmt.shorts[to]}")
+                st.button("Apply", key="apply_rotation", on_click=apply_moves, args=(moves,))
+            if schedule:
+                st.table([{
+                    "At": format_elapsed_time(at),
+                    "Changes": ", ".join(f"{names[p]} {fmt.shorts[a]}→{fmt.shorts[b]}"
+                                         for p, a, b in changes),
+                } for at, changes in schedule])
+
+    cols = st.columns(len(fmt.columns))
+    for idx, category in enumerate(fmt.columns):
+        col = cols[idx]
+        for p in snap["columns"][category]:
+            pct = snap["pct"][p]
+            bg, fg = get_color(fmt, category)
+            col.markdown(
+                f"<div style='font-weight:bold;font-size:20px;margin-bottom:0.25rem;'>"
+                f"{html.escape(names[p])} | <span class='tt-pct-{p}'>{pct:.0f}%</span> | "
+                f"<span style='background-color:{bg};color:{fg};padding:4px 12px;"
+                f"border:1px solid {bg};border-radius:4px;'>{fmt.shorts[category]}</span>"
+                f"</div>",
+                unsafe_allow_html=True
+            )
+            cur = fmt.shorts[category]
+            # Another tab on this match may have moved the player
+            if st.session_state.get(f"radio_{p}", cur) != cur:
+                st.session_state.pop(f"radio_{p}")
+            col.radio(names[p], fmt.shorts, index=category,
+                      key=f"radio_{p}", horizontal=True, label_visibility="collapsed",
+                      on_change=commit_position_change, args=(p,))
+
+    # A new rotation changes the report table too, so redraw the whole page
+    if (snap["rotations"] != st.session_state.match_snap["rotations"]).any():
+        st.rerun(scope="app")
+
 # ---------------------------------------------------------------------
 # Match Page
 # ---------------------------------------------------------------------
 def show_match():
-    # Auto‑refresh & accumulate while running
-    if st.session_state.quarter_running:
-        accumulate_time()
-        st_autorefresh(interval=1000, limit=None, key="clock_autorefresh")
+    log = current_match()
+    fmt = log.format
+    # One writer per match; other coach sessions watch until they take over
+    channel = match_channel(log.match_id)
+    if not channel.claim(session_id()):
+        refused = st.session_state.pop("write_refused", False)
+        if refused or any(st.session_state.get(k) for k in WRITE_BUTTONS):
+            st.warning("Your last change was not saved: another device took over recording "
+                       "this match. Take over to carry on recording here.")
+        st.info("This match is being recorded on another device.")
+        if st.button("Take over recording", key="take_over"):
+            channel.claim(session_id(), force=True)
+            st.rerun()
+        spectator_view(log.match_id)
+        return
+    st.session_state.pop("write_refused", None)
+    writer_heartbeat()
+    if st.session_state.offline_mode and sync_offline(log):
+        # Late events can end (or re-shape) earlier quarters too
+        save_quarter_reports(log)
+    state = log.state()
+    # While running, either tick in the browser (reruns only on real events)
+    # or fall back to a full 1 Hz rerun. Totals are folded from the log.
+    client_clock = st.session_state.client_clock
+    if state.running and not client_clock:
+        tick(st_autorefresh(interval=1000, limit=None, key="clock_autorefresh"), 1.0)
 
     now = time.time()
+    laps = Laps()
     # 1) Header row
-    if st.session_state.quarter_running:
-        elapsed = now - st.session_state.quarter_start_time
+    if state.running:
+        elapsed = log.quarter_elapsed(now)
         mm, ss = divmod(int(elapsed), 60)
         timer_str = f"{mm:02d}:{ss:02d}"
     else:
@@ -105,9 +427,10 @@ def show_match():
         padding:0 1.3rem 0 0;  /* top, right, bottom, left */
     ">
         <h1 style="margin:0; padding:0;">Time on Ground</h1>
-        <div style="font-size:3.5rem; line-height:1;">{timer_str}</div>
+        <div class="tt-timer" style="font-size:3.5rem; line-height:1;">{timer_str}</div>
     </div>
     """, unsafe_allow_html=True)
+    laps.lap("header")
 
     # 2) Control row
     control_cols = st.columns(4)
@@ -125,100 +448,48 @@ def show_match():
         with label_col:
             st.markdown(
                 f"<div style='display:flex; align-items:center; height:100%; margin-left:2rem;'>"
-                f"<strong>Quarter {st.session_state.quarter_number}</strong>"
+                f"<strong>{fmt.period_name} {state.quarter}</strong>"
                 f"</div>",
                 unsafe_allow_html=True
             )
         with btn_col:
             # Finished state
-            if st.session_state.match_finished:
+            if state.finished:
                 st.markdown("<div style='text-align:center; color:green;'>Match Finished</div>",
                             unsafe_allow_html=True)
             # Start
-            elif not st.session_state.quarter_running:
-                if st.button("Start Quarter", key="start_btn"):
-                    now = time.time()
-                    st.session_state.quarter_running = True
-                    st.session_state.quarter_start_time = now
-                    st.session_state.last_update_time = now
-                    # snapshot for restart
-                    st.session_state.pre_quarter_position_time = {
-                        p: st.session_state.position_time[p].copy()
-                        for p in st.session_state.players
-                    }
-                    # bump existing on‑field
-                    for p, pos in st.session_state.current_positions.items():
-                        if pos != "Off":
-                            st.session_state.rotations[p] += 1
-                    st.session_state.alert_msg = f"Quarter {st.session_state.quarter_number} started!"
+            elif not state.running:
+                if st.button(f"Start {fmt.period_name}", key="start_btn"):
+                    log.append(QUARTER_START)
+                    st.session_state.alert_msg = f"{fmt.period_name} {state.quarter} started!"
                     st.rerun()
             # End Quarter / End Match
             else:
-                is_last = (st.session_state.quarter_number == 4)
-                btn_label = "End Match" if is_last else "End Quarter"
+                is_last = fmt.is_last(state.quarter)
+                btn_label = "End Match" if is_last else f"End {fmt.period_name}"
                 if st.button(btn_label, key="end_btn"):
-                    now = time.time()
-                    accumulate_time()
-                    dur = now - st.session_state.quarter_start_time
-                    st.session_state.quarter_durations[st.session_state.quarter_number] = dur
-                    qr = st.session_state.quarter_reports
-                    qr[st.session_state.quarter_number] = {
-                        p: st.session_state.position_time[p].copy()
-                        for p in st.session_state.players
-                    }
-                    st.session_state.quarter_reports = qr
-                    st.session_state.quarter_running = False
+                    quarter = state.quarter
+                    log.append(QUARTER_END, last=is_last)
+                    save_quarter_reports(log)
                     if is_last:
-                        st.session_state.match_finished = True
                         st.session_state.alert_msg = "Match Finished!"
                     else:
-                        st.session_state.alert_msg = f"Quarter {st.session_state.quarter_number} ended."
-                        st.session_state.quarter_number += 1
+                        st.session_state.alert_msg = f"{fmt.period_name} {quarter} ended."
                     st.rerun()
+    laps.lap("controls")
 
-    # 3) Compute total match seconds
-    total_match_secs = sum(st.session_state.quarter_durations.get(q, 0.0)
-                           for q in range(1, st.session_state.quarter_number))
-    if st.session_state.quarter_running:
-        total_match_secs += now - st.session_state.quarter_start_time
-
-    # 4) Player columns by category
-    short = {"Forward":"FWD","Midfield":"MID","Defence":"DEF","Off":"Off"}
-    choices = ["Off","FWD","MID","DEF"]
-    to_internal = {"FWD":"Forward","MID":"Midfield","DEF":"Defence","Off":"Off"}
-
-    def pct_for(p):
-        pd = st.session_state.position_time[p]
-        total = pd["Forward"] + pd["Midfield"] + pd["Defence"]
-        return (total / total_match_secs * 100) if total_match_secs>0 else 0
-
-    cols = st.columns(4)
-    new_pos = {}
-    for idx, category in enumerate(["Off","Defence","Midfield","Forward"]):
-        col = cols[idx]
-        players_in_cat = [p for p in st.session_state.players
-                          if st.session_state.current_positions.get(p,"Off")==category]
-        if category=="Off":
-            players_in_cat.sort(key=pct_for)
-        else:
-            players_in_cat.sort(key=pct_for, reverse=True)
-        for p in players_in_cat:
-            pct = pct_for(p)
-            bg, fg = get_color(category)
-            col.markdown(
-                f"<div style='font-weight:bold;font-size:20px;margin-bottom:0.25rem;'>"
-                f"{p} | {pct:.0f}% | "
-                f"<span style='background-color:{bg};color:{fg};padding:4px 12px;"
-                f"border:1px solid {bg};border-radius:4px;'>{short[category]}</span>"
-                f"</div>",
-                unsafe_allow_html=True
-            )
-            cur = short[st.session_state.current_positions[p]]
-            sel = col.radio("", choices, index=choices.index(cur),
-                            key=f"radio_{p}", horizontal=True,
-                            on_change=commit_position_change, args=(p,))
-            new_pos[p] = to_internal[sel]
-    st.session_state.current_positions.update(new_pos)
+    # 3) Derive totals, percentages and column order once for this rerun
+    snap = match_view().compute(now)
+    st.session_state.match_snap = snap
+    laps.lap("match_view")
+
+    # 4) Player columns by category (a fragment: moving a player reruns only this),
+    #    or the device-side pad in offline mode
+    if st.session_state.offline_mode:
+        offline_pad(log)
+    else:
+        player_columns()
+    laps = Laps()
 
     # 5) Final Match Report
     st.markdown("---")
@@ -229,40 +500,45 @@ def show_match():
         "</div>",
         unsafe_allow_html=True
     )
-    report_data = []
-    for p in st.session_state.players:
-        pd = st.session_state.position_time[p]
-        fwd, mid, dfc = pd["Forward"], pd["Midfield"], pd["Defence"]
-        tot = fwd + mid + dfc
-        pct_game = (tot / total_match_secs * 100) if total_match_secs>0 else 0
-        report_data.append((pct_game, {
-            "Player": p,
-            "FWD": format_elapsed_time(fwd),
-            "MID": format_elapsed_time(mid),
-            "DEF": format_elapsed_time(dfc),
-            "Total": format_elapsed_time(tot),
-            "Pct (Game)": f"{pct_game:.0f}%",
-            "Rotations": st.session_state.rotations.get(p,0)
-        }))
-    report_data.sort(key=lambda x: x[0], reverse=True)
-    st.table([row for _, row in report_data])
+    report_rows = MatchView.report_rows(snap, format_elapsed_time)
+    st.table(report_rows)
+    laps.lap("report_table")
 
     # 6) Quarter Lengths
-    st.subheader("Quarter Lengths")
+    st.subheader(f"{fmt.period_name} Lengths")
     qlens, total = {}, 0.0
-    for q in range(1,5):
-        if q < st.session_state.quarter_number:
-            dur = st.session_state.quarter_durations.get(q,0.0)
-        elif q==st.session_state.quarter_number and st.session_state.quarter_running:
-            dur = now - st.session_state.quarter_start_time
+    for q, label in enumerate(fmt.period_labels, 1):
+        if q in state.durations:
+            dur = state.durations[q]
+        elif q==state.quarter and state.running:
+            dur = snap["quarter_secs"]
         else:
             dur = 0.0
         total += dur
         m, s = divmod(int(dur), 60)
-        qlens[f"Q{q}"] = f"{m:02d}:{s:02d}"
+        qlens[label] = f"{m:02d}:{s:02d}"
     m, s = divmod(int(total),60)
     qlens["Total"] = f"{m:02d}:{s:02d}"
     st.table([qlens])
+    laps.lap("quarter_table")
+
+    # Timeline: only built while the toggle is on
+    if st.toggle("Show timeline", key="show_timeline"):
+        show_timeline(log, snap["now"])
+        laps.lap("timeline")
+
+    with st.expander("Export match data"):
+        st.caption(f"Completed {fmt.period_name.lower()}s of this match.")
+        store, match_id = log.store, log.match_id
+        for c, (kind, (_, mime, ext)) in zip(st.columns(3), list(FORMATS.items())[:3]):
+            c.download_button(kind, key=f"match_export_{ext}", mime=mime,
+                              file_name=f"match-{match_id[:8]}.{ext}",
+                              data=lambda kind=kind: export(match_rows(store, [(match_id, None)]), kind))
+
+    with st.expander("Share live view"):
+        st.write("Spectators can follow the match read-only, without logging in:")
+        st.code(share_link(log.match_id), language=None)
+    laps.lap("exports")
 
     # 7) Bottom controls: Restart Match | Restart Quarter | Export PDF
     st.markdown("---")
@@ -270,119 +546,224 @@ def show_match():
     # Restart Match
     with col1:
         if st.button("Restart Match", key="restart_btn"):
-            names = st.session_state.players
-            st.session_state.match_finished = False
-            st.session_state.quarter_running = False
-            st.session_state.quarter_number = 1
-            st.session_state.quarter_start_time = 0.0
-            st.session_state.last_update_time = 0.0
+            log.append(RESTART)
+            log.store.delete_quarter_reports(log.match_id)
+            log.store.set_status(log.match_id, "live")
+            reset_position_widgets(range(len(log.players)))
             st.session_state.alert_msg = ""
-            st.session_state.position_time = {n:{"Forward":0,"Midfield":0,"Defence":0} for n in names}
-            st.session_state.current_positions = {n:"Off" for n in names}
-            st.session_state.rotations = {n:0 for n in names}
-            st.session_state.quarter_reports = {}
-            st.session_state.quarter_durations = {}
             st.success("Match reset! Player list preserved.")
             st.rerun()
     # Restart Quarter
     with col2:
-        if st.button("Restart Quarter", key="restart_qtr_btn"):
-            now = time.time()
-            qn = st.session_state.quarter_number
-            pre = st.session_state.get("pre_quarter_position_time",{})
-            for p in st.session_state.players:
-                if p in pre:
-                    st.session_state.position_time[p] = pre[p].copy()
-            st.session_state.quarter_running = False
-            st.session_state.quarter_start_time = 0.0
-            st.session_state.last_update_time = 0.0
-            st.session_state.quarter_durations.pop(qn,None)
-            st.session_state.quarter_reports.pop(qn,None)
-            st.session_state.alert_msg = f"Quarter {qn} reset. Press Start to begin."
+        if st.button(f"Restart {fmt.period_name}", key="restart_qtr_btn"):
+            qn = state.quarter
+            # Truncate the log back to this quarter's start (lineup included)
+            log.restart_quarter()
+            log.store.delete_quarter_reports(log.match_id, from_quarter=qn)
+            log.store.set_status(log.match_id, "live")
+            reset_position_widgets(range(len(log.players)))
+            st.session_state.alert_msg = f"{fmt.period_name} {qn} reset. Press Start to begin."
             st.rerun()
-    # Export PDF
+    # Export PDF (built on request, or once the match is finished)
     with col3:
-        try:
-            from io import BytesIO
-            from reportlab.lib.pagesizes import letter
-            from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-            from reportlab.lib import colors
-            from reportlab.lib.styles import getSampleStyleSheet
-            buffer = BytesIO()
-            doc = SimpleDocTemplate(buffer, pagesize=letter)
-            elems, styles = [], getSampleStyleSheet()
-            elems.append(Paragraph("Time on Ground Match Report", styles["Heading2"]))
-            elems.append(Spacer(1,12))
-            data = [list(report_data[0][1].keys())] + [list(r.values()) for _,r in report_data]
-            tbl = Table(data, repeatRows=1)
-            tbl.setStyle(TableStyle([
-                ("BACKGROUND",(0,0),(-1,0),colors.lightgrey),
-                ("GRID",(0,0),(-1,-1),0.5,colors.grey),
-                ("ALIGN",(0,0),(-1,-1),"CENTER"),
-                ("VALIGN",(0,0),(-1,-1),"MIDDLE"),
-            ]))
-            elems.append(tbl)
-            doc.build(elems)
-            pdf_bytes = buffer.getvalue()
-            st.download_button(
-                label="Export Final Report PDF",
-                data=pdf_bytes,
-                file_name="final_report.pdf",
-                mime="application/pdf",
-                key="export_pdf"
-            )
-        except ModuleNotFoundError:
-            st.error("Install reportlab to enable PDF export.")
+        rows = report_rows
+        if state.finished or st.button("Prepare Report PDF", key="prepare_pdf"):
+            try:
+                pdf_bytes = build_report_pdf(report_digest(rows), rows)
+                st.download_button(
+                    label="Export Final Report PDF",
+                    data=pdf_bytes,
+                    file_name="final_report.pdf",
+                    mime="application/pdf",
+                    key="export_pdf"
+                )
+            except ModuleNotFoundError:
+                st.error("Install reportlab to enable PDF export.")
+    laps.lap("pdf")
+
+def show_timeline(log, now):
+    """Gantt chart, stint summary, who-was-on lookup and replay of the open match."""
+    fmt = log.format
+    timeline = Timeline.from_log(log, now)
+    if not len(timeline.player):
+        st.caption(f"The timeline starts with the first {fmt.period_name.lower()}.")
+        return
+    st.altair_chart(gantt_chart(timeline), width="stretch")
+    st.dataframe(timeline.summary(), hide_index=True)
+
+    c1, c2 = st.columns(2)
+    periods = sorted(timeline.offsets)
+    period = c1.selectbox(fmt.period_name, periods, index=len(periods) - 1, key="timeline_period",
+                          format_func=lambda q: fmt.period_labels[q - 1])
+    secs = parse_elapsed_time(c2.text_input("At (mm:ss)", "00:00", key="timeline_at"))
+    if secs is None:
+        st.warning("Enter a time like 12:30.")
+    else:
+        on = timeline.on_field(period, secs)
+        st.write(f"On the field at {format_elapsed_time(secs)} in {fmt.period_labels[period - 1]}: "
+                 + (", ".join(f"{log.players[p]} ({fmt.shorts[pos]})" for p, pos in on) or "nobody"))
+
+    # Replay ended periods only, so the player isn't reset by the live clock
+    speed = st.select_slider("Replay speed", [10, 30, 60, 120], value=30, key="timeline_speed",
+                             format_func=lambda s: f"{s}×")
+    ended = Timeline.from_log(log)
+    if len(ended.player):
+        render_replay(ended, speed)
+
+# ---------------------------------------------------------------------
+# Season Page
+# ---------------------------------------------------------------------
+def show_season():
+    st.header("Season")
+    this_year = current_season()
+    season = st.selectbox("Season", list(range(this_year, this_year - 5, -1)))
+    team_id = st.session_state.team_id
+    analytics = season_analytics(team_id, season)
+    analytics.refresh()
+    store = get_store()
+    if not analytics.match_count:
+        st.write("No finished matches this season yet.")
+    else:
+        fair = analytics.fairness()
+        m1, m2, m3 = st.columns(3)
+        m1.metric("Matches", analytics.match_count)
+        m2.metric("Average Game %", f"{fair['mean']:.0f}%")
+        m3.metric("Spread (min → max)", f"{fair['min']:.0f}% → {fair['max']:.0f}%")
+        summary = analytics.summary()
+        st.subheader("Game Time")
+        st.bar_chart(summary["Game %"])
+        st.dataframe(summary.drop(columns=["Played", "Available"]).round(1))
+
+        st.subheader("Stints")
+        stints = analytics.stint_summary().copy()
+        for col in ("Longest stint", "Mean stint", "Bench time", "Bench / game"):
+            stints[col] = stints[col].map(format_elapsed_time)
+        st.dataframe(stints)
+        with st.expander("Who was on?"):
+            matches = analytics.matches()
+            c1, c2, c3 = st.columns(3)
+            match_id = c1.selectbox("Match", [m for m, _ in matches], key="season_on_match",
+                                    format_func=dict(matches).get)
+            periods = analytics.match_format(match_id).periods
+            # Switching to a match with fewer periods
+            if st.session_state.get("season_on_period", 1) > periods:
+                st.session_state.season_on_period = periods
+            period = c2.number_input("Period", min_value=1, max_value=periods, key="season_on_period")
+            secs = parse_elapsed_time(c3.text_input("At (mm:ss)", "00:00", key="season_on_at"))
+            if secs is not None:
+                st.table(analytics.on_field_at(match_id, int(period), secs))
+
+        st.subheader("Export")
+        fmt = st.selectbox("Format", list(FORMATS), key="season_export_format")
+        _, mime, ext = FORMATS[fmt]
+        # Built when clicked, on Streamlit's download thread
+        st.download_button(f"Download season report ({fmt})",
+                           data=lambda: export(season_rows(store, team_id, season), fmt),
+                           file_name=f"season-{season}.{ext}", mime=mime, key="season_export")
+
+    with st.expander("Round reports"):
+        day = st.date_input("Round date", key="round_date")
+        url = store_url()
+        teams = visible_teams()
+        st.download_button("Download every match report for the round (PDF zip)",
+                           data=lambda: spool(pdf_zip_stream(url, round_matches(store, day, teams))),
+                           file_name=f"round-{day}.zip", mime="application/zip", key="round_export")
+
+# ---------------------------------------------------------------------
+# Admin Page
+# ---------------------------------------------------------------------
+def show_admin():
+    st.header("Performance")
+    reg = registry()
+    st.subheader("This session")
+    rec = reg.session(session_id(), st.session_state.team_id)
+    m1, m2, m3 = st.columns(3)
+    m1.metric("Reruns", rec["reruns"])
+    m2.metric("Session state", f"{state_size() / 1024:.1f} KB")
+    m3.metric("Autorefresh tick lag", f"{rec['tick_lag'] * 1000:.0f} ms")
+    perf = st.session_state.get("perf", {})
+    st.table([{"Stage": name, "Runs": n, "Mean (ms)": f"{total / n * 1000:.1f}",
+               "Last (ms)": f"{last * 1000:.1f}"}
+              for name, (n, total, last) in sorted(perf.items())])
+
+    st.subheader("Teams on this server")
+    names = dict(get_store().teams())
+    teams = sorted(reg.by_team().items(), key=lambda kv: kv[1]["cpu"], reverse=True)
+    st.table([{"Team": names.get(t, t), "Sessions": v["sessions"], "Reruns": v["reruns"],
+               "CPU (s)": f"{v['cpu']:.2f}", "Wall (s)": f"{v['wall']:.2f}"} for t, v in teams])
+
+    with st.expander("Prometheus metrics"):
+        if metrics_url():
+            st.write(f"Also published to `{metrics_url()}` for scraping.")
+        st.code(reg.prometheus(), language=None)
+
+    st.header("Users")
+    store = get_store()
+    st.table([{"User": u, "Admin": "yes" if a else "",
+               "Teams": ", ".join(names.get(t, t) for t in store.user_teams(u))}
+              for u, a in store.users()])
+    with st.form("user_form", clear_on_submit=True):
+        st.caption("Adds a user, or resets an existing user's password, teams and role. "
+                   "Their open sessions are signed out.")
+        username = st.text_input("Username")
+        password = st.text_input("Password", type="password")
+        team_ids = st.multiselect("Teams", list(names), format_func=lambda t: names[t])
+        is_admin = st.checkbox("Admin (sees every team)")
+        if st.form_submit_button("Save user"):
+            if username.strip() and len(password) >= MIN_PASSWORD:
+                save_user(username.strip(), password, team_ids, is_admin)
+                st.success(f"Saved {username.strip()}.")
+            else:
+                st.warning(f"Enter a username and a password of at least {MIN_PASSWORD} characters.")
 
 # ---------------------------------------------------------------------
 # Main App
 # ---------------------------------------------------------------------
 def main_app():
+    with rerun():
+        render_app()
+
+def render_app():
+    laps = Laps()
     # Inject CSS & draw sidebar
-    st.markdown("""
-    <style>
-    .block-container { padding-top:1.5rem!important; margin-top:0!important; }
-    html, body, [class*="css"] { font-family:-apple-system,BlinkMacSystemFont,"Segoe UI",Roboto,"Helvetica Neue",sans-serif; }
-    [data-testid="stSidebar"] { background-color:#AAA8A8!important; color:#fff!important; padding-top:10px!important; }
-    .stButton>button { background-color:#F0145A!important; color:#fff!important; border-radius:5px!important; width:90%!important; height:40px!important; font-size:16px!important; margin:0 auto 10px auto!important; display:block!important; border:none!important; transition:0.2s; }
-    .stButton>button:hover { background-color:#F6729B!important; color:#000!important; }
-    .sidebar-title { text-align:center; font-size:20px; color:#000; margin:10px 0; }
-    .powered-by { text-align:center; font-size:12px; color:#000; margin-top:20px; }
-    .stDownloadButton>button { background-color:#F0145A!important; color:#fff!important; border-radius:5px!important; width:90%!important; height:40px!important; font-size:16px!important; margin:0 auto!important; display:block!important; border:none!important; transition:0.2s; }
-    .stDownloadButton>button:hover { background-color:#F6729B!important; color:#000!important; }
-    </style>
-    """, unsafe_allow_html=True)
+    st.markdown(stylesheet("styles/app.css"), unsafe_allow_html=True)
+    write_cookie()
+    laps.lap("css")
     customize_sidebar()
+    laps.lap("sidebar")
 
     # Initialize session state defaults
     defaults = {
-        "players": ["Player Name 1","Player Name 2","Player Name 3","Player Name 4"],
-        "position_time": {},
-        "current_positions": {},
-        "quarter_running": False,
-        "quarter_number": 1,
-        "quarter_start_time": 0.0,
-        "last_update_time": 0.0,
-        "rotations": {},
-        "quarter_reports": {},
-        "quarter_durations": {},
         "alert_msg": "",
-        "match_finished": False,
+        "client_clock": True,
+        "offline_mode": False,
         "page": "Settings",
     }
     for k, v in defaults.items():
         if k not in st.session_state:
             st.session_state[k] = v
-
-    # Seed per-player structures
-    for p in st.session_state.players:
-        st.session_state.position_time.setdefault(p, {"Forward":0,"Midfield":0,"Defence":0})
-        st.session_state.current_positions.setdefault(p, "Off")
-        st.session_state.rotations.setdefault(p, 0)
+    if "team_id" not in st.session_state or not allowed_team(st.session_state.team_id):
+        leave_match()
+        teams = st.session_state.get("teams")
+        if teams is None:
+            st.session_state.team_id = get_store().ensure_team(DEFAULT_TEAM)
+        elif teams:
+            st.session_state.team_id = teams[0]
+        else:
+            st.error("Your account is not in any team yet. Ask an admin to add you to one.")
+            return
+    if "match_id" not in st.session_state:
+        open_match()
 
     # Route pages
     if st.session_state.page == "Settings":
         show_settings()
+        laps.lap("settings")
+    elif st.session_state.page == "Season":
+        show_season()
+        laps.lap("season")
+    elif st.session_state.page == "Admin" and st.session_state.get("is_admin"):
+        show_admin()
     else:
         show_match()
 
@@ -0,0 +1,39 @@
+import pytest
+from auth import LOCKED, RETIRED_HASHES, check_password, lock_retired, seed_admin
+from storage import SQLiteMatchStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    return SQLiteMatchStore(str(tmp_path / "club.db"))
+
+
+def test_seed_admin_from_env(store, monkeypatch):
+    monkeypatch.setenv("TEAMTRACKER_ADMIN", "coach")
+    monkeypatch.setenv("TEAMTRACKER_ADMIN_PASSWORD", "long enough")
+    assert seed_admin(store) == "coach"
+    password, is_admin = store.user("coach")
+    assert is_admin and check_password("long enough", password)
+
+
+def test_seed_admin_generates_a_password(store, monkeypatch, caplog):
+    monkeypatch.delenv("TEAMTRACKER_ADMIN", raising=False)
+    monkeypatch.delenv("TEAMTRACKER_ADMIN_PASSWORD", raising=False)
+    seed_admin(store)
+    generated = caplog.records[-1].args[1]
+    assert len(generated) >= 8 and check_password(generated, store.user("admin")[0])
+
+
+def test_seed_admin_refuses_short_passwords(store, monkeypatch):
+    monkeypatch.setenv("TEAMTRACKER_ADMIN_PASSWORD", "1")
+    with pytest.raises(ValueError):
+        seed_admin(store)
+
+
+def test_known_passwords_are_locked(store):
+    store.save_user("old", next(iter(RETIRED_HASHES)), True)
+    store.save_session("key", "old", 2**40)
+    lock_retired(store)
+    assert store.user("old")[0] == LOCKED
+    assert not check_password("", LOCKED)
+    assert store.load_session("key") is None
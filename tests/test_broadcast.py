@@ -0,0 +1,18 @@
+from broadcast import HEARTBEAT_SECS, WRITER_LEASE, MatchChannel
+
+
+def test_heartbeats_keep_the_writer_lease():
+    channel = MatchChannel("m")
+    assert channel.claim("coach", now=0)
+    # A heartbeat per HEARTBEAT_SECS keeps the match through a quiet 20-minute quarter
+    for t in range(HEARTBEAT_SECS, 20 * 60, HEARTBEAT_SECS):
+        assert not channel.claim("other", now=t)
+        assert channel.claim("coach", now=t)
+
+
+def test_lease_lapses_when_the_writer_is_gone():
+    channel = MatchChannel("m")
+    channel.claim("coach", now=0)
+    assert not channel.claim("other", now=WRITER_LEASE)
+    assert channel.claim("other", now=WRITER_LEASE + 1)
+    assert not channel.claim("coach", now=WRITER_LEASE + 2)
@@ -0,0 +1,68 @@
+from match_log import MatchLog, POSITION, QUARTER_END, QUARTER_START, RESTART
+from storage import SQLiteMatchStore
+
+
+def _kinds(log):
+    return [e["kind"] for e in log.events]
+
+
+def test_restart_quarter_after_restart_match():
+    log = MatchLog(players=["a", "b"])
+    log.append(QUARTER_START)
+    log.append(QUARTER_END)
+    log.append(QUARTER_START)
+    log.append(RESTART)
+    log.append(QUARTER_START)
+    log.append(POSITION, player=0, position="Forward")
+    assert log.state().quarter == 1
+    assert log.restart_quarter()
+    assert _kinds(log) == [QUARTER_START, QUARTER_END, QUARTER_START, RESTART]
+    assert not log.state().running
+
+
+def test_restart_quarter_ignores_duplicate_starts():
+    log = MatchLog(players=["a", "b"])
+    log.append(QUARTER_START)
+    log.append(QUARTER_START)
+    log.append(QUARTER_END)
+    log.append(QUARTER_START)
+    log.append(POSITION, player=1, position="Forward")
+    assert log.state().quarter == 2
+    assert log.restart_quarter()
+    assert _kinds(log) == [QUARTER_START, QUARTER_START, QUARTER_END]
+    assert log.state().quarter == 2
+
+
+def test_merge_rewrites_the_stored_tail_in_one_transaction(tmp_path):
+    store = SQLiteMatchStore(str(tmp_path / "club.db"))
+    match_id = store.create_match(["a", "b"])
+    log = MatchLog(store=store, match_id=match_id, players=["a", "b"])
+    log.append(QUARTER_START)
+    log.append(POSITION, player=0, position="Forward")
+    late = {"id": "late", "t": log.events[0]["t"] - 1, "kind": POSITION,
+            "player": 1, "position": "Forward"}
+    calls = []
+    store.truncate_events = lambda *args: calls.append(args)
+    assert log.merge([late]) == 1
+    assert not calls
+    saved = store.load_match(match_id)["events"]
+    assert [e["kind"] for e in saved] == [e["kind"] for e in log.events]
+    assert saved[0]["id"] == "late"
+
+
+def test_merge_before_the_first_checkpoint():
+    log = MatchLog(players=["a", "b"])
+    log.append(POSITION, player=0, position="Forward")
+    log.append(QUARTER_START)
+    log.state()
+    early = {"id": "early", "t": log.events[0]["t"] - 1, "kind": POSITION,
+             "player": 1, "position": "Forward"}
+    assert log.merge([early]) == 1
+    state = log.state()
+    assert state.running
+    assert list(state.position) == [1, 1]
+    # The checkpoint is rebuilt at the start's new index, so a later rewind is right
+    log.append(POSITION, player=0, position="Off")
+    assert log.restart_quarter()
+    assert _kinds(log) == [POSITION, POSITION]
+    assert not log.state().running and list(log.state().position) == [1, 1]
@@ -0,0 +1,11 @@
+from metrics import Registry
+
+
+def test_exposition_has_no_session_ids():
+    reg = Registry()
+    reg.observe("rerun", "team-1", 0.02, 0.01)
+    for sid in ("session-a", "session-b"):
+        reg.session(sid, "team-1")["state_bytes"] = 100
+    text = reg.prometheus()
+    assert "session-a" not in text and "session=" not in text
+    assert 'teamtracker_sessions{team="team-1"} 2' in text
@@ -0,0 +1,36 @@
+import time
+import pytest
+from match_log import MatchLog, POSITION, QUARTER_START
+from offline_sync import _clean, sync_batch
+
+
+@pytest.mark.parametrize("event", [
+    None,
+    "position",
+    {"kind": POSITION, "id": "a", "t": "soon", "player": 0, "position": 1},
+    {"kind": POSITION, "id": "a", "t": None, "player": 0, "position": 1},
+    {"kind": POSITION, "id": "a", "t": float("inf"), "player": 0, "position": 1},
+    {"kind": POSITION, "id": "a", "player": "first", "position": 1},
+    {"kind": POSITION, "id": "a", "player": [0], "position": 1},
+    {"kind": POSITION, "id": "a", "position": 1},
+    {"kind": POSITION, "id": "a", "player": 0, "position": 9},
+    {"kind": "restart", "id": "a"},
+    {"kind": QUARTER_START, "id": 7},
+])
+def test_malformed_events_are_dropped(event):
+    assert _clean(event, 2, 4, time.time()) is None
+
+
+def test_sync_batch_skips_bad_events_and_keeps_good_ones():
+    log = MatchLog(players=["a", "b"])
+    now = time.time()
+    batch = {"batch": 1, "events": [
+        {"kind": QUARTER_START, "id": "q", "t": now - 10},
+        {"kind": POSITION, "id": "bad", "t": "x", "player": 0, "position": 1},
+        "junk",
+        {"kind": POSITION, "id": "p", "t": now - 5, "player": "1", "position": "2"},
+    ]}
+    acked, added = sync_batch(log, batch)
+    assert acked == ["q", "bad", "p"] and added == 2
+    assert list(log.state().position) == [0, 2]
+    assert sync_batch(log, {"events": "nope"}) == ([], 0)
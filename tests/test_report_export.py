@@ -0,0 +1,37 @@
+import io
+import zipfile
+import pytest
+from streamlit.runtime.download_data_util import convert_data_to_bytes_and_infer_mime
+from report_export import FORMATS, export, spool
+
+ROWS = [{"match": "m1", "date": "2026-04-01", "player": f"Player {i}", "forward": 60.0,
+         "midfield": 30.0, "defence": 0.0, "on_ground": 90.0, "match_secs": 120.0,
+         "pct": 75.0, "rotations": 2} for i in range(3)]
+
+
+def _download(data):
+    """What st.download_button does with a data callable's result."""
+    return convert_data_to_bytes_and_infer_mime(data, TypeError("unsupported"))[0]
+
+
+@pytest.mark.parametrize("fmt", list(FORMATS))
+def test_export_is_a_download_button_payload(fmt):
+    data = _download(export(iter(ROWS), fmt))
+    assert data
+    if fmt == "CSV":
+        assert data.decode().splitlines()[0].startswith("match,date,player,forward")
+    elif fmt == "XLSX":
+        assert "xl/worksheets/sheet1.xml" in zipfile.ZipFile(io.BytesIO(data)).namelist()
+
+
+def test_spool_spilled_to_disk_is_still_downloadable():
+    chunks = [b"x" * 1000] * 10
+    out = spool(iter(chunks), max_memory=100)
+    assert isinstance(out, io.BufferedReader)
+    assert _download(out) == b"x" * 10000
+
+
+def test_spool_stays_in_memory_below_the_limit():
+    out = spool(iter(["a,b\n", b"1,2\n"]), max_memory=100)
+    assert isinstance(out, io.BytesIO)
+    assert _download(out) == b"a,b\n1,2\n"
@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+from match_model import Position
+from rotation_planner import plan_quarter, suggest_substitutions
+
+# 25 players: 7 on the bench, then 6 each in the three field positions
+POSITIONS = np.array([0] * 7 + [1] * 6 + [2] * 6 + [3] * 6)
+
+
+def _times(bench_secs, field_secs):
+    times = np.zeros((len(POSITIONS), 4))
+    for p, pos in enumerate(POSITIONS):
+        times[p, pos] = bench_secs if pos == Position.OFF else field_secs
+    return times
+
+
+def _apply(positions, moves):
+    positions = positions.copy()
+    for p, frm, to in moves:
+        assert positions[p] == frm
+        positions[p] = to
+    return positions
+
+
+def test_fresh_bench_comes_on_within_the_limit():
+    moves = suggest_substitutions(_times(0, 1200), POSITIONS, 240, 1200)
+    assert 0 < len(moves) <= 4
+    assert sum(frm == Position.OFF for _, frm, _ in moves) == 2
+    after = _apply(POSITIONS, moves)
+    assert (np.bincount(after, minlength=4) == np.bincount(POSITIONS, minlength=4)).all()
+
+
+def test_mild_imbalance_still_suggests_moves():
+    assert suggest_substitutions(_times(300, 600), POSITIONS, 240, 600)
+
+
+@pytest.mark.parametrize("max_changes", [1, 2, 3, 4, 6])
+def test_limit_holds_for_random_lineups(max_changes):
+    rng = np.random.default_rng(max_changes)
+    for _ in range(50):
+        n = int(rng.integers(5, 26))
+        positions = rng.integers(0, 4, n)
+        times = rng.uniform(0, 1200, (n, 4))
+        moves = suggest_substitutions(times, positions, 240, 1200, max_changes=max_changes)
+        assert len(moves) <= max_changes
+        after = _apply(positions, moves)
+        assert (np.bincount(after, minlength=4) == np.bincount(positions, minlength=4)).all()
+
+
+@pytest.mark.parametrize("max_changes", [2, 4])
+def test_plan_quarter_windows_respect_the_limit(max_changes):
+    schedule = plan_quarter(_times(0, 1200), POSITIONS, 1200, 0, 1200, max_changes=max_changes)
+    assert schedule
+    assert all(len(moves) <= max_changes for _, moves in schedule)
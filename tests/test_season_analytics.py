@@ -0,0 +1,74 @@
+import pytest
+import season_analytics
+from match_formats import get_format
+from report_export import season_rows
+from season_analytics import SeasonAnalytics, current_season
+from storage import SQLiteMatchStore
+
+LABELS = ["Off", "Forward", "Midfield", "Defence"]
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = SQLiteMatchStore(str(tmp_path / "club.db"))
+    monkeypatch.setattr(season_analytics, "get_store", lambda: store)
+    return store
+
+
+def _finish(store, match_id, forward_secs):
+    report = {"players": ["Ann", "Bob"], "positions": LABELS,
+              "time": [[0, forward_secs, 0, 0], [forward_secs, 0, 0, 0]]}
+    store.save_quarter_report(match_id, 1, 600.0, report, [1, 0])
+    store.set_status(match_id, "finished")
+
+
+def _game_pct(analytics):
+    return analytics.summary()["Game %"].to_dict()
+
+
+def test_refresh_reloads_restarted_and_refinished_matches(store):
+    team_id = store.ensure_team("Reds")
+    match_id = store.create_match(["Ann", "Bob"], team_id)
+    _finish(store, match_id, 600.0)
+    analytics = SeasonAnalytics(team_id, current_season())
+    assert analytics.refresh() == 1
+    assert _game_pct(analytics)["Ann"] == pytest.approx(100.0)
+    assert analytics.refresh() == 0
+
+    # Restarted: no longer finished, so its rows go
+    store.delete_quarter_reports(match_id)
+    store.set_status(match_id, "live")
+    assert analytics.refresh() == 1
+    assert analytics.match_count == 0
+
+    # Finished again with different numbers
+    _finish(store, match_id, 300.0)
+    assert analytics.refresh() == 1
+    assert analytics.match_count == 1
+    assert _game_pct(analytics)["Ann"] == pytest.approx(50.0)
+
+
+def test_players_are_keyed_by_squad_id(store):
+    team_id = store.ensure_team("Reds")
+    store.update_squad(team_id, [{"name": "Sam"}, {"name": "Bob"}])
+    sam, bob = [p["id"] for p in store.squad(team_id)]
+    report = {"players": ["Sam", "Bob"], "positions": LABELS, "time": [[0, 600, 0, 0], [600, 0, 0, 0]]}
+    first = store.create_match(["Sam", "Bob"], team_id, [sam, bob])
+    store.save_quarter_report(first, 1, 600.0, report, [1, 0])
+    store.set_status(first, "finished")
+    # Bob is renamed Sam: a namesake, not the same player
+    report = {"players": ["Sammy", "Sam"], "positions": LABELS, "time": [[0, 600, 0, 0], [0, 600, 0, 0]]}
+    second = store.create_match(["Sammy", "Sam"], team_id, [sam, bob])
+    store.save_quarter_report(second, 1, 600.0, report, [1, 1])
+    store.set_status(second, "finished")
+
+    analytics = SeasonAnalytics(team_id, current_season())
+    analytics.refresh()
+    summary = analytics.summary()
+    assert len(summary) == 2
+    assert summary.loc["Sammy", "Game %"] == pytest.approx(100.0)
+    assert summary.loc["Sam", "Game %"] == pytest.approx(50.0)
+    assert analytics.match_format(first).periods == get_format(None).periods
+
+    rows = list(season_rows(store, team_id, current_season()))
+    assert {r["player_id"] for r in rows} == {sam, bob}
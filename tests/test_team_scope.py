@@ -0,0 +1,35 @@
+import pytest
+from roster_io import import_rosters
+from storage import SQLiteMatchStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = SQLiteMatchStore(str(tmp_path / "club.db"))
+    for team, names in (("Reds", ["Ann", "Abe"]), ("Blues", ["Amy"])):
+        store.update_squad(store.ensure_team(team), [{"id": None, "name": n, "number": None}
+                                                     for n in names])
+    return store
+
+
+def test_find_players_is_scoped_to_teams(store):
+    reds = store.ensure_team("Reds")
+    assert {team for _, _, team in store.find_players("a")} == {"Reds", "Blues"}
+    assert {team for _, _, team in store.find_players("a", team_ids=[reds])} == {"Reds"}
+    assert store.find_players("a", team_ids=[]) == []
+
+
+def test_export_squads_is_scoped_to_teams(store):
+    reds = store.ensure_team("Reds")
+    assert {r["team"] for r in store.export_squads([reds])} == {"Reds"}
+
+
+def test_import_refuses_other_teams(store):
+    reds = store.ensure_team("Reds")
+    rows = [{"team": "Blues", "id": None, "name": "Zed", "number": None, "active": True}]
+    with pytest.raises(ValueError):
+        import_rosters(store, rows, reds, team_ids=[reds])
+    assert "Zed" not in [p["name"] for p in store.squad(store.ensure_team("Blues"))]
+    rows[0]["team"] = "Reds"
+    import_rosters(store, rows, reds, team_ids=[reds])
+    assert "Zed" in [p["name"] for p in store.squad(reds)]
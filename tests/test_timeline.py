@@ -0,0 +1,111 @@
+import numpy as np
+import pytest
+import timeline
+from match_formats import get_format
+from match_log import POSITION, QUARTER_END, QUARTER_START, RESTART
+from timeline import IntervalIndex, Timeline, fold_stints, render_replay
+
+
+def test_replay_escapes_player_names(monkeypatch):
+    shown = []
+    monkeypatch.setattr(timeline.st, "iframe", lambda html, height: shown.append(html), raising=False)
+    stints = [(0, 1, 1, 0.0, 60.0)]
+    render_replay(Timeline(stints, {1: 60.0}, ["</script><script>alert(1)</script>"], get_format(None)))
+    assert "</script><script>alert" not in shown[0]
+    assert "\\u003c/script>\\u003cscript>alert(1)" in shown[0]
+
+
+def _ev(kind, t, **data):
+    return {"kind": kind, "t": t, **data}
+
+
+def test_interval_index_at_is_half_open():
+    # Two back-to-back periods of the same player, and one long stint
+    index = IntervalIndex([0, 600, 100], [600, 1200, 1200])
+    assert index.at(0).tolist() == [0]
+    assert index.at(599.9).tolist() == [0, 2]
+    assert index.at(600).tolist() == [1, 2]        # period boundary: the next stint only
+    assert index.at(1200).tolist() == []
+    assert index.at(-1).tolist() == []
+
+
+def test_interval_index_overlapping():
+    index = IntervalIndex([0, 600, 100], [600, 1200, 1200])
+    assert index.overlapping(600, 700).tolist() == [1, 2]
+    assert index.overlapping(500, 600).tolist() == [0, 2]
+    assert index.overlapping(0, 50).tolist() == [0]
+    assert index.overlapping(1200, 1300).tolist() == []
+
+
+def test_interval_index_matches_brute_force():
+    rng = np.random.default_rng(0)
+    starts = rng.uniform(0, 1000, 200)
+    ends = starts + rng.uniform(0.1, 50, 200)
+    index = IntervalIndex(starts, ends)
+    for t in rng.uniform(-10, 1060, 100):
+        assert index.at(t).tolist() == np.flatnonzero((starts <= t) & (t < ends)).tolist()
+        a, b = t, t + 20
+        assert index.overlapping(a, b).tolist() == np.flatnonzero((starts < b) & (ends > a)).tolist()
+
+
+def test_fold_stints_cuts_at_period_ends():
+    events = [
+        _ev(POSITION, 0, player=0, position=1),
+        _ev(QUARTER_START, 10),
+        _ev(POSITION, 70, player=0, position=2),
+        _ev(QUARTER_END, 110),
+        _ev(QUARTER_START, 200),
+        _ev(QUARTER_END, 250, last=True),
+    ]
+    stints, durations = fold_stints(events, ["a", "b"])
+    assert durations == {1: 100, 2: 50}
+    assert sorted(s for s in stints if s[0] == 0) == [(0, 1, 1, 0, 60), (0, 2, 1, 60, 100),
+                                                      (0, 2, 2, 0, 50)]
+    assert sorted(s for s in stints if s[0] == 1) == [(1, 0, 1, 0, 100), (1, 0, 2, 0, 50)]
+
+
+def test_fold_stints_ignores_duplicate_starts_and_ends():
+    events = [
+        _ev(POSITION, 0, player=0, position=1),
+        _ev(QUARTER_START, 10),
+        _ev(QUARTER_START, 30),
+        _ev(QUARTER_END, 60),
+        _ev(QUARTER_END, 80),
+    ]
+    stints, durations = fold_stints(events, ["a"])
+    assert durations == {1: 50}
+    assert stints == [(0, 1, 1, 0, 50)]
+
+
+def test_fold_stints_starts_over_after_restart():
+    events = [
+        _ev(POSITION, 0, player=0, position=1),
+        _ev(QUARTER_START, 10),
+        _ev(QUARTER_END, 40),
+        _ev(RESTART, 50),
+        _ev(QUARTER_START, 60),
+        _ev(POSITION, 70, player=0, position=3),
+    ]
+    stints, durations = fold_stints(events, ["a"], now=100)
+    assert durations == {}
+    # The lineup was reset by the restart: Off until the move, then Defence until now
+    assert stints == [(0, 0, 1, 0, 10), (0, 3, 1, 10, 40)]
+
+
+def test_timeline_on_field_across_periods():
+    events = [
+        _ev(POSITION, 0, player=0, position=1),
+        _ev(QUARTER_START, 0),
+        _ev(POSITION, 30, player=1, position=2),
+        _ev(QUARTER_END, 60),
+        _ev(QUARTER_START, 100),
+        _ev(POSITION, 120, player=0, position=0),
+        _ev(QUARTER_END, 160, last=True),
+    ]
+    stints, durations = fold_stints(events, ["a", "b"])
+    line = Timeline(stints, durations, ["a", "b"], get_format(None))
+    assert line.offsets == {1: 0.0, 2: 60.0}
+    assert line.on_field(1, 10) == [(0, 1)]
+    assert line.on_field(1, 59.9) == [(0, 1), (1, 2)]
+    assert line.on_field(2, 0) == [(0, 1), (1, 2)]
+    assert line.on_field(2, 20) == [(1, 2)]
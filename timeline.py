@@ -0,0 +1,302 @@
+import json
+import numpy as np
+import pandas as pd
+import streamlit as st
+import streamlit.components.v1 as components
+from match_log import POSITION, QUARTER_START, QUARTER_END, RESTART, _player_id
+from match_model import Position, to_position
+
+# ---------------------------------------------------------------------
+# Stints and match timelines
+#
+# A stint is one unbroken interval a player spent in one position (Off
+# included, so bench time is a stint too). Stints are cut at every period
+# end, so none is longer than a period. They are folded from the event log
+# (a position change closes the player's stint and opens the next) and
+# stored per match when a period ends, so season queries never replay
+# logs.
+#
+# Intervals are kept on the match clock (seconds of play since the first
+# period started, breaks excluded). IntervalIndex answers "who was on at
+# t" with two binary searches: with starts sorted, any stint covering t
+# began in (t - longest stint, t], and because stints are period-bounded
+# that window only ever holds the few stints around t.
+# ---------------------------------------------------------------------
+class IntervalIndex:
+    """Stabbing and overlap queries over [start, end) intervals."""
+    def __init__(self, starts, ends):
+        starts, ends = np.asarray(starts, dtype=float), np.asarray(ends, dtype=float)
+        self._order = np.argsort(starts, kind="stable")
+        self._starts = starts[self._order]
+        self._ends = ends[self._order]
+        self._span = float((ends - starts).max()) if len(starts) else 0.0
+
+    def at(self, t):
+        """Row numbers of the intervals containing `t`."""
+        lo = np.searchsorted(self._starts, t - self._span, side="right")
+        hi = np.searchsorted(self._starts, t, side="right")
+        hit = self._ends[lo:hi] > t
+        return np.sort(self._order[lo:hi][hit])
+
+    def overlapping(self, a, b):
+        """Row numbers of the intervals overlapping [a, b)."""
+        lo = np.searchsorted(self._starts, a - self._span, side="right")
+        hi = np.searchsorted(self._starts, b, side="left")
+        hit = self._ends[lo:hi] > a
+        return np.sort(self._order[lo:hi][hit])
+
+
+def fold_stints(events, players, now=None):
+    """(stints, durations) from a match's event log.
+
+    Stints are (player, position, period, start, end) with start/end in
+    seconds into the period; durations maps each ended period to its
+    length. With `now`, stints of a running period are closed at `now`.
+    """
+    n = len(players)
+    stints, durations = [], {}
+    position, opened = [int(Position.OFF)] * n, [0.0] * n
+    running = finished = False
+    period, period_start = 1, 0.0
+
+    def close_all(t):
+        for p in range(n):
+            stints.append((p, position[p], period, opened[p] - period_start, t - period_start))
+
+    for event in events:
+        kind, t = event["kind"], event["t"]
+        if kind == RESTART:
+            stints, durations = [], {}
+            position = [int(Position.OFF)] * n
+            running = finished = False
+            period = 1
+        elif kind == QUARTER_START:
+            if running or finished:
+                continue
+            running, period_start = True, t
+            opened = [t] * n
+        elif kind == POSITION:
+            p, new_pos = _player_id(players, event["player"]), int(to_position(event["position"]))
+            if running and new_pos != position[p]:
+                stints.append((p, position[p], period, opened[p] - period_start, t - period_start))
+                opened[p] = t
+            position[p] = new_pos
+        elif kind == QUARTER_END:
+            if not running:
+                continue
+            close_all(t)
+            durations[period] = t - period_start
+            running = False
+            if event.get("last"):
+                finished = True
+            else:
+                period += 1
+    if running and now is not None:
+        close_all(max(now, period_start))
+    return [s for s in stints if s[4] > s[3]], durations
+
+
+class Timeline:
+    """One match's stints as parallel arrays, indexed on the match clock."""
+    def __init__(self, stints, durations, players, fmt, live_period=None):
+        self.players = list(players)
+        self.format = fmt
+        rows = np.asarray(stints, dtype=float).reshape(-1, 5)
+        self.player = rows[:, 0].astype(int)
+        self.position = rows[:, 1].astype(int)
+        self.period = rows[:, 2].astype(int)
+        self.start = rows[:, 3]
+        self.end = rows[:, 4]
+        # Match clock at the start of each period
+        self.durations = dict(durations)
+        if live_period is not None and (self.period == live_period).any():
+            self.durations.setdefault(live_period, float(self.end[self.period == live_period].max()))
+        self.offsets, total = {}, 0.0
+        for q in sorted(self.durations):
+            self.offsets[q] = total
+            total += self.durations[q]
+        self.length = total
+        base = np.array([self.offsets.get(q, 0.0) for q in self.period])
+        self.match_start = base + self.start
+        self.match_end = base + self.end
+        self.index = IntervalIndex(self.match_start, self.match_end)
+
+    @classmethod
+    def from_log(cls, log, now=None):
+        """Timeline of a live match; the running period's stints end at `now`."""
+        with log.lock:
+            state = log.state()
+            stints, durations = fold_stints(log.events, log.players,
+                                            now if state.running else None)
+            live = state.quarter if state.running and now is not None else None
+        return cls(stints, durations, log.players, log.format, live)
+
+    def rows(self):
+        """Stints for storage: (player, position label, period, start, end)."""
+        labels = self.format.labels
+        return [(int(p), labels[pos], int(q), float(a), float(b)) for p, pos, q, a, b in
+                zip(self.player, self.position, self.period, self.start, self.end)]
+
+    # --- queries ---------------------------------------------------
+    def clock(self, period, secs):
+        """Match clock of `secs` into `period`."""
+        return self.offsets.get(period, self.length) + secs
+
+    def at(self, period, secs):
+        """[(player, position)] in the given period at `secs` into it."""
+        rows = self.index.at(self.clock(period, secs))
+        rows = rows[self.period[rows] == period]
+        return sorted(zip(self.player[rows].tolist(), self.position[rows].tolist()),
+                      key=lambda pp: (pp[1], pp[0]))
+
+    def on_field(self, period, secs):
+        """Players on the field in `period` at `secs` into it, by position."""
+        return [(p, pos) for p, pos in self.at(period, secs) if pos != Position.OFF]
+
+    def summary(self):
+        """Per player: on-field stints, longest and mean stint, bench time."""
+        n = len(self.players)
+        secs = self.end - self.start
+        on = self.position != Position.OFF
+        count = np.bincount(self.player[on], minlength=n)
+        played = np.bincount(self.player[on], weights=secs[on], minlength=n)
+        longest = np.zeros(n)
+        np.maximum.at(longest, self.player[on], secs[on])
+        bench = np.bincount(self.player[~on], weights=secs[~on], minlength=n)
+        return pd.DataFrame({
+            "Player": self.players,
+            "Stints": count,
+            "Longest stint": [_mmss(s) for s in longest],
+            "Mean stint": [_mmss(p / c if c else 0) for p, c in zip(played, count)],
+            "Bench time": [_mmss(s) for s in bench],
+        })
+
+    def frame(self):
+        """One row per stint, for charts and tables."""
+        fmt = self.format
+        return pd.DataFrame({
+            "Player": [self.players[p] for p in self.player],
+            "Position": [fmt.labels[pos] for pos in self.position],
+            "Period": [fmt.period_labels[q - 1] if q <= fmt.periods else f"{q}"
+                       for q in self.period],
+            "From": self.match_start / 60,
+            "To": self.match_end / 60,
+            "Length": [_mmss(s) for s in self.end - self.start],
+        })
+
+
+def _mmss(secs):
+    m, s = divmod(int(secs), 60)
+    return f"{m:02d}:{s:02d}"
+
+
+# --- rendering -------------------------------------------------------
+def gantt_chart(timeline):
+    """Altair Gantt chart: a bar per stint, a row per player, coloured by position."""
+    import altair as alt
+    fmt = timeline.format
+    frame = timeline.frame()
+    scale = alt.Scale(domain=list(fmt.labels), range=[bg for bg, _ in fmt.colors])
+    bars = alt.Chart(frame).mark_bar().encode(
+        x=alt.X("From:Q", title="Match minutes"),
+        x2="To:Q",
+        y=alt.Y("Player:N", sort=timeline.players, title=None),
+        color=alt.Color("Position:N", scale=scale, legend=alt.Legend(orient="bottom")),
+        tooltip=["Player", "Position", "Period", "Length"],
+    )
+    breaks = pd.DataFrame({"At": [o / 60 for q, o in sorted(timeline.offsets.items()) if q > 1]})
+    rules = alt.Chart(breaks).mark_rule(color="grey", strokeDash=[4, 4]).encode(x="At:Q")
+    return (bars + rules).properties(height=max(120, 24 * len(timeline.players)))
+
+
+_REPLAY = """
+<div id="replay" style="font-family:-apple-system,BlinkMacSystemFont,'Segoe UI',Roboto,sans-serif;">
+  <div style="display:flex;align-items:center;gap:12px;margin-bottom:8px;">
+    <button id="play" style="border:none;border-radius:5px;padding:6px 14px;background:#F0145A;color:#fff;
+            font-size:15px;">Play</button>
+    <input id="seek" type="range" min="0" step="1" style="flex:1;">
+    <strong id="clock" style="font-size:22px;min-width:8rem;text-align:right;"></strong>
+  </div>
+  <div id="cols" style="display:flex;gap:10px;flex-wrap:wrap;"></div>
+</div>
+<script>
+(function() {
+  const data = %s;
+  const seek = document.getElementById("seek"), play = document.getElementById("play");
+  const clock = document.getElementById("clock"), cols = document.getElementById("cols");
+  seek.max = Math.ceil(data.length);
+  let t = 0, last = null, playing = false;
+  const mmss = (s) => String(Math.floor(s / 60)).padStart(2, "0") + ":"
+                      + String(Math.floor(s %% 60)).padStart(2, "0");
+  function draw() {
+    let label = "", into = t;
+    data.periods.forEach(([name, offset]) => { if (t >= offset) { label = name; into = t - offset; } });
+    clock.textContent = label + " " + mmss(into);
+    seek.value = t;
+    const where = {};
+    data.stints.forEach(([p, pos, a, b]) => { if (a <= t && t < b) where[p] = pos; });
+    cols.innerHTML = "";
+    data.columns.forEach((pos) => {
+      const col = document.createElement("div");
+      col.style.cssText = "flex:1;min-width:7rem;";
+      const head = document.createElement("div");
+      head.textContent = data.labels[pos];
+      head.style.cssText = "color:#fff;border-radius:4px;padding:3px 10px;margin-bottom:4px;"
+                         + "font-weight:bold;background:" + data.colors[pos];
+      col.appendChild(head);
+      data.names.forEach((name, p) => {
+        if (where[p] !== pos) return;
+        const card = document.createElement("div");
+        card.textContent = name;
+        card.style.cssText = "font-weight:bold;margin-bottom:2px;";
+        col.appendChild(card);
+      });
+      cols.appendChild(col);
+    });
+  }
+  function frame(ts) {
+    if (!playing) return;
+    if (last !== null) t = Math.min(data.length, t + (ts - last) / 1000 * data.speed);
+    last = ts;
+    draw();
+    if (t >= data.length) { playing = false; play.textContent = "Play"; return; }
+    requestAnimationFrame(frame);
+  }
+  play.onclick = () => {
+    playing = !playing;
+    play.textContent = playing ? "Pause" : "Play";
+    if (playing) { if (t >= data.length) t = 0; last = null; requestAnimationFrame(frame); }
+  };
+  seek.oninput = () => { t = Number(seek.value); draw(); };
+  draw();
+})();
+</script>
+"""
+
+
+def render_replay(timeline, speed=30):
+    """Replay the match in the browser at `speed` × real time.
+
+    The whole timeline is sent once; playback, seeking and the position
+    columns run client-side, so replaying costs no reruns.
+    """
+    fmt = timeline.format
+    data = {
+        "names": timeline.players,
+        "labels": list(fmt.labels),
+        "colors": [bg for bg, _ in fmt.colors],
+        "columns": list(fmt.columns),
+        "periods": [[fmt.period_labels[q - 1] if q <= fmt.periods else str(q), o]
+                    for q, o in sorted(timeline.offsets.items())],
+        "stints": [[int(p), int(pos), round(float(a), 2), round(float(b), 2)] for p, pos, a, b in
+                   zip(timeline.player, timeline.position, timeline.match_start, timeline.match_end)],
+        "length": timeline.length,
+        "speed": speed,
+    }
+    # Names are user input: keep "</script>" in one from closing the script
+    html = _REPLAY % json.dumps(data).replace("<", "\\u003c")
+    height = 90 + 24 * len(timeline.players)
+    if hasattr(st, "iframe"):
+        st.iframe(html, height=height)
+    else:
+        components.html(html, height=height)